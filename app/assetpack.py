@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+# 빌드 단계에서 만든 프레임 팩(frames.pack) 포맷 읽기/쓰기
+#
+#   [MAGIC 4B][VERSION u32][MANIFEST_LEN u32][MANIFEST json utf-8][BLOB ...]
+#
+# 블롭 목록의 항목은 [오프셋, 길이, 색 수]. 내용은 zlib 으로 압축되어 있고
+#   색 수 > 0: 팔레트(색 수 × u32 ARGB) + 캔버스 전체의 8bit 색 번호 — 256색 이하인 GIF 프레임
+#   색 수 = 0: 액션별 트림 영역만 잘라낸 ARGB32 Premultiplied 픽셀 — 색이 더 많은 프레임
+# 같은 내용의 프레임은 블롭 하나를 공유한다.
+#
+# 배포용 아카이브(assets.yjar)는 같은 구조로 모든 캐릭터를 파일 하나에 담는다.
+# 매니페스트가 {"chars": {이름: {"files": character.json 액션 표, "actions": ...}}, "blobs": [...]}
+# 이고 블롭 영역은 캐릭터끼리 공유한다. 읽을 때는 파일을 mmap 해서 매핑된 바이트에서 바로 푼다.
+import hashlib, json, mmap, struct, zlib
+from pathlib import Path
+from PyQt5 import QtCore, QtGui
+
+PACK_FILE    = "frames.pack"
+PACK_MAGIC   = b"YJPK"
+PACK_VERSION = 2
+ARCHIVE_FILE    = "assets.yjar"
+ARCHIVE_MAGIC   = b"YJAR"
+ARCHIVE_VERSION = 2
+_HEADER      = struct.Struct("<4sII")
+_PIX_FORMAT  = QtGui.QImage.Format_ARGB32_Premultiplied
+_IDX_FORMAT  = QtGui.QImage.Format_Indexed8
+
+
+def _alpha_bbox(img: QtGui.QImage):
+    # 알파 0 이 아닌 영역 (x0, y0, x1, y1) — 비어 있으면 None
+    w, h = img.width(), img.height()
+    bpl = img.bytesPerLine()
+    data = bytes(img.constBits().asarray(img.sizeInBytes()))
+    x0, y0, x1, y1 = w, h, -1, -1
+    for y in range(h):
+        alpha = data[y*bpl:y*bpl + w*4][3::4]
+        stripped = alpha.lstrip(b"\0")
+        if not stripped:
+            continue
+        left = w - len(stripped)
+        right = w - (len(alpha) - len(alpha.rstrip(b"\0")))
+        x0 = min(x0, left); x1 = max(x1, right)
+        y0 = min(y0, y); y1 = max(y1, y + 1)
+    if x1 < 0:
+        return None
+    return x0, y0, x1, y1
+
+
+def _image_bytes(img: QtGui.QImage, depth: int = 4) -> bytes:
+    w, h = img.width(), img.height()
+    bpl = img.bytesPerLine()
+    data = bytes(img.constBits().asarray(img.sizeInBytes()))
+    if bpl == w * depth:
+        return data[:w*h*depth]
+    return b"".join(data[y*bpl:y*bpl + w*depth] for y in range(h))
+
+
+def _indexed_bytes(img: QtGui.QImage) -> bytes:
+    # 팔레트 + 색 번호. 팔레트는 QRgb(비-premultiplied ARGB) 를 u32 little-endian 으로
+    table = img.colorTable()
+    return struct.pack(f"<{len(table)}I", *table) + _image_bytes(img, 1)
+
+
+def _map_file(path: Path):
+    try:
+        with open(path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):   # ValueError: 빈 파일
+        return None
+
+
+def _read_manifest(buf, magic: bytes, version: int):
+    # → (매니페스트, 블롭 영역 시작) / 형식이 다르면 None
+    try:
+        m, v, mlen = _HEADER.unpack_from(buf, 0)
+        if m != magic or v != version:
+            return None
+        manifest = json.loads(bytes(buf[_HEADER.size:_HEADER.size + mlen]).decode("utf-8"))
+    except (ValueError, struct.error):
+        return None
+    return manifest, _HEADER.size + mlen
+
+
+def _write_file(path: Path, magic: bytes, version: int, manifest: dict, payload):
+    data = json.dumps(manifest, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    size = _HEADER.size + len(data)
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(magic, version, len(data)))
+        f.write(data)
+        for comp in payload:
+            f.write(comp)
+            size += len(comp)
+    tmp.replace(path)
+    return size
+
+
+class BlobStore:
+    # 압축된 프레임 블롭 목록. 픽셀이 같으면 기존 블롭 번호를 돌려준다
+    def __init__(self, level: int = 6):
+        self.level = level
+        self.blobs = []
+        self.payload = []
+        self._offset = 0
+        self._dedup = {}
+
+    def add(self, raw: bytes, colors: int = 0) -> int:
+        digest = (hashlib.blake2b(raw, digest_size=16).digest(), colors)
+        idx = self._dedup.get(digest)
+        if idx is None:
+            comp = zlib.compress(raw, self.level)
+            idx = len(self.blobs)
+            self.blobs.append([self._offset, len(comp), colors])
+            self.payload.append(comp)
+            self._offset += len(comp)
+            self._dedup[digest] = idx
+        return idx
+
+
+class PackWriter:
+    # indexer: QImage → 손실 없는 Indexed8 QImage 또는 None (main.to_indexed). 없으면 전부 32bit
+    def __init__(self, char_name: str, level: int = 6, store: BlobStore = None, indexer=None):
+        self.char_name = char_name
+        self.store = store or BlobStore(level)
+        self.indexer = indexer
+        self.actions = {}
+
+    @property
+    def blobs(self):
+        return self.store.blobs
+
+    def add_action(self, action: str, source: Path, rel: str, images, delays):
+        # images: 캔버스 크기가 같은 QImage 목록, delays: 초 단위
+        images = [im.convertToFormat(_PIX_FORMAT) for im in images]
+        cw = max(im.width() for im in images)
+        ch = max(im.height() for im in images)
+        box = None
+        for im in images:
+            b = _alpha_bbox(im)
+            if b is None:
+                continue
+            if box is None:
+                box = b
+            else:
+                box = (min(box[0], b[0]), min(box[1], b[1]), max(box[2], b[2]), max(box[3], b[3]))
+        if box is None:
+            box = (0, 0, 1, 1)
+        tx, ty = box[0], box[1]
+        tw, th = box[2] - box[0], box[3] - box[1]
+
+        frames = []
+        for im, d in zip(images, delays):
+            ix = self.indexer(im) if self.indexer and (im.width(), im.height()) == (cw, ch) else None
+            if ix is not None:
+                idx = self.store.add(_indexed_bytes(ix), ix.colorCount())
+            else:
+                idx = self.store.add(_image_bytes(im.copy(tx, ty, tw, th)))
+            frames.append([idx, int(round(d * 1000))])
+
+        avg = sum(delays) / len(delays) if delays else 0.05
+        self.actions[action] = {
+            "source": rel,
+            "source_size": source.stat().st_size if source.exists() else None,
+            "size": [cw, ch],
+            "trim": [tx, ty, tw, th],
+            "anchor": [tx + tw // 2, ty + th],   # 캔버스 기준 발 위치(트림 하단 중앙)
+            "fps": round(1.0 / avg, 3) if avg > 0 else 20.0,
+            "frames": frames,
+        }
+
+    def write(self, path: Path):
+        return _write_file(path, PACK_MAGIC, PACK_VERSION, {
+            "char": self.char_name,
+            "format": "indexed8+argb32_premultiplied",
+            "compression": "zlib",
+            "actions": self.actions,
+            "blobs": self.blobs,
+        }, self.store.payload)
+
+
+class ArchiveWriter:
+    def __init__(self, level: int = 6, indexer=None):
+        self.store = BlobStore(level)
+        self.indexer = indexer
+        self.chars = {}     # 이름 → (character.json 액션 표, PackWriter)
+
+    def add_char(self, name: str, files: dict) -> PackWriter:
+        writer = PackWriter(name, store=self.store, indexer=self.indexer)
+        self.chars[name] = (files, writer)
+        return writer
+
+    def write(self, path: Path):
+        return _write_file(path, ARCHIVE_MAGIC, ARCHIVE_VERSION, {
+            "format": "indexed8+argb32_premultiplied",
+            "compression": "zlib",
+            "chars": {name: {"files": files, "actions": w.actions}
+                      for name, (files, w) in self.chars.items()},
+            "blobs": self.store.blobs,
+        }, self.store.payload)
+
+
+class AssetPack:
+    def __init__(self, path: Path, manifest: dict, data_offset: int, buf):
+        self.path = path
+        self.manifest = manifest
+        self.actions = manifest.get("actions", {})
+        self.blobs = manifest.get("blobs", [])
+        self._data_offset = data_offset
+        self._buf = buf     # 파일 전체 mmap (아카이브면 캐릭터끼리 공유)
+
+    @classmethod
+    def open(cls, path: Path, char_name: str):
+        buf = _map_file(path)
+        if buf is None:
+            return None
+        res = _read_manifest(buf, PACK_MAGIC, PACK_VERSION)
+        if res is None or res[0].get("char") != char_name:
+            buf.close()
+            return None
+        return cls(path, res[0], res[1], buf)
+
+    def is_fresh(self, action: str, source: Path) -> bool:
+        # 원본 GIF 가 옆에 있고 크기가 바뀌었으면 팩이 낡은 것
+        ent = self.actions.get(action)
+        if ent is None:
+            return False
+        size = ent.get("source_size")
+        if size is not None and source.exists() and source.stat().st_size != size:
+            return False
+        return True
+
+    def decode(self, action: str):
+        # → (QImage 목록, 지연(초) 목록, 최대 w, 최대 h) / 없으면 None
+        # 팔레트 프레임은 Indexed8 QImage 로 돌려준다 — 팔레트 보관 모드는 변환 없이 그대로 쓴다
+        ent = self.actions.get(action)
+        if ent is None or not ent.get("frames"):
+            return None
+        cw, ch = ent["size"]
+        images, delays = [], []
+        cache = {}
+        with memoryview(self._buf) as view:
+            for idx, delay_ms in ent["frames"]:
+                img = cache.get(idx)
+                if img is None:
+                    img = cache[idx] = self._blob_image(view, idx, ent)
+                images.append(img)
+                delays.append(delay_ms / 1000.0)
+        return images, delays, cw, ch
+
+    def _blob_image(self, view, idx: int, ent: dict) -> QtGui.QImage:
+        off, length, colors = self.blobs[idx]
+        start = self._data_offset + off
+        raw = zlib.decompress(view[start:start + length])
+        cw, ch = ent["size"]
+        if colors:
+            img = QtGui.QImage(raw[colors*4:], cw, ch, cw, _IDX_FORMAT)
+            img.setColorTable(list(struct.unpack_from(f"<{colors}I", raw)))   # 여기서 버퍼를 복사해 소유
+            return img
+        tx, ty, tw, th = ent["trim"]
+        trimmed = QtGui.QImage(raw, tw, th, tw * 4, _PIX_FORMAT)
+        img = QtGui.QImage(cw, ch, _PIX_FORMAT)
+        img.fill(QtCore.Qt.transparent)
+        p = QtGui.QPainter(img)
+        p.setCompositionMode(QtGui.QPainter.CompositionMode_Source)
+        p.drawImage(tx, ty, trimmed)
+        p.end()
+        return img
+
+
+class AssetArchive:
+    # 모든 캐릭터가 든 단일 아카이브. 캐릭터별 AssetPack 은 같은 매핑을 나눠 쓴다
+    def __init__(self, path: Path, manifest: dict, data_offset: int, buf):
+        self.path = path
+        self.manifest = manifest
+        self._data_offset = data_offset
+        self._buf = buf
+
+    @classmethod
+    def open(cls, path: Path):
+        buf = _map_file(path)
+        if buf is None:
+            return None
+        res = _read_manifest(buf, ARCHIVE_MAGIC, ARCHIVE_VERSION)
+        if res is None:
+            buf.close()
+            return None
+        return cls(path, res[0], res[1], buf)
+
+    def chars(self) -> dict:
+        # 이름 → character.json 과 같은 액션 표
+        return {name: dict(ent.get("files", {})) for name, ent in self.manifest.get("chars", {}).items()}
+
+    def pack(self, name: str):
+        ent = self.manifest.get("chars", {}).get(name)
+        if ent is None:
+            return None
+        manifest = {"char": name, "actions": ent.get("actions", {}), "blobs": self.manifest.get("blobs", [])}
+        return AssetPack(self.path, manifest, self._data_offset, self._buf)
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+# assets/<CHAR_NAME> 의 GIF/PNG 폴더를 런타임용 frames.pack 으로 미리 변환
+#
+#   python app/build_assets.py                # assets/Yujeong/frames.pack
+#   python app/build_assets.py --char Yujeong --png-fps 12
+#   python app/build_assets.py --archive --out dist/assets.yjar   # 모든 캐릭터를 파일 하나로 (배포용)
+#   python app/build_assets.py --check-indexed   # PET_FRAME_STORAGE=indexed 로 8bit 보관이 되는지 확인
+import argparse, os, sys, time
+from pathlib import Path
+
+# QMovie 는 프레임을 QPixmap 으로 만들기 때문에 QGuiApplication 이 필요하다 — CI 에서는 화면 없이
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5 import QtGui
+
+from assetpack import ARCHIVE_FILE, PACK_FILE, ArchiveWriter, PackWriter
+from main import (ASSETS_DIR, CHAR_NAME, MIN_FRAME_DELAY, SMOOTH_SUFFIX, load_char_actions,
+                  smooth_variant, to_indexed)
+
+
+def decode_gif(path: Path):
+    movie = QtGui.QMovie(path.as_posix())
+    images, delays = [], []
+    idx = 0
+    while movie.jumpToFrame(idx):
+        img = movie.currentImage()
+        if img.isNull():
+            break
+        images.append(img)
+        d = movie.nextFrameDelay()
+        if d <= 0: d = MIN_FRAME_DELAY
+        delays.append(d/1000.0)
+        idx += 1
+    return images, delays
+
+
+def decode_png_folder(folder: Path, fps: float):
+    if not folder.exists():
+        return [], []
+    files = sorted([p for p in folder.iterdir()
+                    if p.suffix.lower() in (".png",".webp",".jpg",".jpeg")],
+                   key=lambda p: p.name)
+    images = []
+    for p in files:
+        img = QtGui.QImage(p.as_posix())
+        if not img.isNull():
+            images.append(img)
+    return images, [1.0/fps] * len(images)
+
+
+def add_char(writer: PackWriter, base: Path, actions: dict, png_fps: float):
+    # 품질 조절기가 쓰는 *_smooth 변형도 "<action>_smooth" 키로 같이 넣는다.
+    # → 프레임이 하나도 안 나온 액션 목록 (비어 있어야 정상)
+    failed = []
+    entries = []
+    for action, rel in actions.items():
+        entries.append((action, rel))
+        if (base / smooth_variant(rel)).exists():
+            entries.append((action + SMOOTH_SUFFIX, smooth_variant(rel)))
+
+    for action, rel in entries:
+        src = base / rel
+        if src.exists():
+            images, delays = decode_gif(src)
+        else:
+            images, delays = decode_png_folder(src.parent, png_fps)
+        if not images:
+            print(f"  {action:<14} 실패 (프레임 없음: {src})", file=sys.stderr)
+            failed.append(action)
+            continue
+        writer.add_action(action, src, rel, images, delays)
+        ent = writer.actions[action]
+        print(f"  {action:<14} {len(images):>4} frames  {ent['size'][0]}x{ent['size'][1]}"
+              f" -> trim {ent['trim'][2]}x{ent['trim'][3]}")
+    return failed
+
+
+def check_indexed(base: Path, actions: dict):
+    # GIF 프레임이 손실 없이 Indexed8 로 들어가는지 — 하나도 안 되는 GIF 목록을 돌려준다
+    bad = []
+    for action, rel in actions.items():
+        src = base / rel
+        if not src.exists():
+            continue
+        images, _delays = decode_gif(src)
+        n = sum(1 for im in images if to_indexed(im) is not None)
+        print(f"  {action:<14} {n:>4}/{len(images)} Indexed8")
+        if not images or n == 0:
+            bad.append(action)
+    return bad
+
+
+def build_archive(args):
+    out = args.out or (args.assets / ARCHIVE_FILE)
+    writer = ArchiveWriter(level=args.level, indexer=to_indexed)
+    t0 = time.perf_counter()
+    failed = []
+    for base in sorted(p for p in args.assets.iterdir() if p.is_dir()):
+        actions = load_char_actions(base)
+        if actions is None:
+            continue
+        print(f"{base.name}")
+        failed += [f"{base.name}/{a}" for a in
+                   add_char(writer.add_char(base.name, actions), base, actions, args.png_fps)]
+    if not writer.chars:
+        print(f"{args.assets} 에 캐릭터 폴더 없음", file=sys.stderr)
+        return 1
+    if failed or not writer.store.blobs:
+        # 배포 빌드는 이 아카이브만 보고 프레임을 읽으므로 빠진 액션이 있으면 만들지 않는다
+        print(f"디코딩 실패 {len(failed)} 개, 프레임 {len(writer.store.blobs)} 개 — {out} 를 쓰지 않음",
+              file=sys.stderr)
+        return 1
+    size = writer.write(out)
+    print(f"{out}: {len(writer.chars)} chars, {len(writer.store.blobs)} unique frames,"
+          f" {size/1e6:.1f} MB, {time.perf_counter() - t0:.1f}s")
+    return 0
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="GIF 에셋을 frames.pack 으로 컴파일")
+    ap.add_argument("--char", default=CHAR_NAME)
+    ap.add_argument("--assets", type=Path, default=ASSETS_DIR)
+    ap.add_argument("--out", type=Path, default=None)
+    ap.add_argument("--png-fps", type=float, default=20.0,
+                    help="PNG 폴더 액션의 재생 속도 (GIF 는 프레임별 지연 사용)")
+    ap.add_argument("--level", type=int, default=6, help="zlib 압축 레벨")
+    ap.add_argument("--archive", action="store_true",
+                    help=f"--assets 아래 모든 캐릭터를 {ARCHIVE_FILE} 하나로 (exe 옆에 두는 배포용)")
+    ap.add_argument("--check-indexed", action="store_true",
+                    help="팩을 만들지 않고 GIF 프레임이 8bit 팔레트로 보관되는지만 확인")
+    args = ap.parse_args(argv)
+
+    app = QtGui.QGuiApplication.instance() or QtGui.QGuiApplication(sys.argv[:1])
+    if args.archive:
+        rc = build_archive(args)
+        del app
+        return rc
+
+    base = args.assets / args.char
+    out = args.out or (base / PACK_FILE)
+    if not base.is_dir():
+        print(f"캐릭터 폴더 없음: {base}", file=sys.stderr)
+        return 1
+
+    actions = load_char_actions(base)
+    if actions is None:
+        print(f"{base / 'character.json'} 를 읽을 수 없음", file=sys.stderr)
+        return 1
+    if args.check_indexed:
+        bad = check_indexed(base, actions)
+        if bad:
+            print(f"Indexed8 로 보관되지 않는 GIF: {', '.join(bad)}", file=sys.stderr)
+        del app
+        return 1 if bad else 0
+    writer = PackWriter(args.char, level=args.level, indexer=to_indexed)
+    t0 = time.perf_counter()
+    failed = add_char(writer, base, actions, args.png_fps)
+    if failed:
+        # 빈 팩을 남기면 런타임이 GIF 대신 빈 프레임을 읽는다
+        print(f"{len(failed)} 개 액션 디코딩 실패 — {out} 를 쓰지 않음", file=sys.stderr)
+        del app
+        return 1
+    size = writer.write(out)
+    print(f"{out}: {len(writer.blobs)} unique frames, {size/1e6:.1f} MB,"
+          f" {time.perf_counter() - t0:.1f}s")
+    del app
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
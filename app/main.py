@@ -1,44 +1,41 @@
 # -*- coding: utf-8 -*-
-import sys, os, random, time, math
-from collections import deque
+import sys, os, random, time, math, json, bisect, functools, multiprocessing, signal
+from collections import OrderedDict, deque
+from multiprocessing import shared_memory
+from enum import IntEnum
 from pathlib import Path
-from PyQt5 import QtCore, QtGui, QtWidgets
+from PyQt5 import QtCore, QtGui, QtNetwork, QtWidgets
+try:
+    import numpy as np      # 여러 공 헤딩 모드에서만 사용. 없으면 그 메뉴 항목만 빠진다
+except ImportError:
+    np = None
+
+import parallel_decode
+import petsim
+from assetpack import ARCHIVE_FILE, AssetArchive, AssetPack, PACK_FILE
 
 CHAR_NAME = "Yujeong"
 BG_MODE   = "rembg"
 BASE_DIR  = Path(getattr(sys, "_MEIPASS", Path(__file__).resolve().parent))
+# 에셋 루트 — frozen 빌드는 _MEIPASS 안, 소스에서 돌리면 app/ 옆(저장소 루트)의 assets/
+ASSETS_DIR = BASE_DIR / "assets" if hasattr(sys, "_MEIPASS") else BASE_DIR.parent / "assets"
+# "qt" = QMovie 로 GUI 스레드에서 디코딩, "process" = Pillow 프로세스 풀 (parallel_decode.py)
+DECODE_BACKEND = os.environ.get("PET_DECODE_BACKEND", "qt")
+# "pixmap" = 원본 프레임을 32bit QPixmap 으로, "indexed" = 8bit 팔레트 QImage 로 보관
+FRAME_STORAGE  = os.environ.get("PET_FRAME_STORAGE", "pixmap")
 
 # =======================
 # 공통 파라미터
 # =======================
 DISPLAY_FPS   = 12
-DISPLAY_DELAY = 1.0 / DISPLAY_FPS
 MIN_FRAME_DELAY     = 40
-INITIAL_SYNC_FRAMES = 2
 WINDOW_PAD          = 2
+QWIDGETSIZE_MAX     = (1 << 24) - 1
 
 EDGE_MARGIN   = 10
 FLOOR_MARGIN  = 2
 
-GRAVITY             = 1.1
-BOUNCE_K            = 0.78
-BOUNCE_MAX          = 4
-BOUNCE_MIN_VEL      = 3.5
-BOUNCE_UP_VEL_FLOOR = 11.0
-
-FREE_BOUNCE_SPEED_TH   = 12.0
-FREE_BOUNCE_DAMP       = 0.78
-FREE_BOUNCE_FRICTION   = 0.985
-FREE_BOUNCE_MIN_SPD    = 1.35
-
-GIANT_FREE_BOUNCE_DAMP     = 0.6
-GIANT_FREE_BOUNCE_FRICTION = 0.94
-GIANT_FREE_BOUNCE_MIN_SPD  = 1.6
-
-FOLLOW_JUMP_NEAR = 60
-FOLLOW_JUMP_HOLD = 0.6
-FOLLOW_FAST_DIST = 400
-FOLLOW_RUN_DIST  = 200
+# 중력/바운스/따라가기 파라미터는 petsim.py 에 있다
 
 SCALE_PRESETS = [
     ("작게", 0.4),
@@ -49,11 +46,79 @@ SCALE_PRESETS = [
 GIANT_SCALE_FACTOR = 4.0
 GIANT_ANIM_DUR     = 0.5
 
+# --- 클릭 판정 ---
+HIT_ALPHA_MIN = 16    # 이 알파 미만인 픽셀은 투명 취급 → 클릭이 바탕화면으로 통과
+
+# --- 로컬 제어 소켓 ---
+# 이름을 주면 QLocalServer 를 연다 (app/petctl.py 로 접속). 비우면 끔
+CONTROL_NAME = os.environ.get("PET_CONTROL", "")
+
+# --- 멀티 프로세스 샤딩 ---
+# N > 0 이면 이 프로세스는 조정자만 하고 펫은 N 개 워커 프로세스에 나눠 띄운다
+SHARDS        = int(os.environ.get("PET_SHARDS", "0") or 0)
+SHARD_POLL_MS = 10
+
+# --- 보이지 않는 펫 ---
+VISIBILITY_MS = 100   # 화면 밖으로 완전히 나갔는지 다시 계산하는 간격
+
 # --- 미니게임 파라미터 ---
 GAME_TICK_MS = 50  # 20fps
 SNACK_ITEM_SIZE = 30
+HEAD_MULTI_START    = 3       # 여러 공 헤딩: 처음 공 수
+HEAD_MULTI_MAX      = 48
+HEAD_MULTI_ADD_SEC  = 4.0     # 이 간격마다 공 하나 추가
+HEAD_MULTI_LIVES    = 5
+HEAD_MULTI_RADII    = (10, 14, 18)
 OBSTACLE_MIN_INTERVAL = 0.04
 
+# --- 프레임 타이밍 통계 ---
+FRAME_STATS_BIN_MS  = 1      # 히스토그램 칸 폭(ms)
+FRAME_COST_BIN_MS   = 0.1    # update_loop 비용은 더 촘촘하게
+FRAME_STATS_BINS    = 250    # 0~249칸 + 초과 1칸
+FRAME_LATE_MS       = 20.0   # next_frame_time 보다 tick(16ms) 한 번 이상 늦으면 지연 프레임
+FRAME_STATS_REPORT  = os.environ.get("PET_FRAME_STATS", "") == "1"  # 종료 시 요약 출력
+
+# --- 트레이스 ---
+# PET_TRACE=경로 : 디코딩/스케일/tick/그리기 구간을 링 버퍼에 모아 두었다가
+# 메뉴·제어 소켓 요청이나 종료 시 Chrome trace JSON 으로 저장 (chrome://tracing, Perfetto)
+TRACE_PATH   = os.environ.get("PET_TRACE", "")
+TRACE_EVENTS = 200_000    # 링 버퍼에 남기는 최근 구간 수
+
+# --- 품질 조절 ---
+# (표시 fps, GIF 변형, 스케일 방식) — 0 이 최고 품질, QUALITY_START 가 기본 동작
+QUALITY_LEVELS = [
+    (15, "smooth", QtCore.Qt.SmoothTransformation),
+    (DISPLAY_FPS, "plain", QtCore.Qt.SmoothTransformation),
+    (10, "plain", QtCore.Qt.FastTransformation),
+    (6,  "plain", QtCore.Qt.FastTransformation),
+]
+QUALITY_START       = 1
+# 가장 높은 표시 fps 로도 보일 수 없는 프레임은 캐시에 넣지 않는다
+FRAME_MIN_HOLD      = 1.0 / max(fps for (fps, _v, _t) in QUALITY_LEVELS)
+QUALITY_INTERVAL_MS = 1000
+QUALITY_BUDGET_MS   = 8.0    # tick 한 번에 모든 펫 update_loop 비용 합(p95) 허용치
+QUALITY_LATE_RATIO  = 0.2    # 지연 프레임 비율이 이 이상이면 압박
+QUALITY_DOWN_AFTER  = 2      # 연속 압박 구간 수 → 한 단계 내림
+QUALITY_UP_AFTER    = 5      # 연속 여유 구간 수 → 한 단계 올림
+SMOOTH_LOAD_MS      = 150    # smooth 변형을 액션 하나씩 나눠서 로드
+SMOOTH_SUFFIX       = "_smooth"
+
+# --- 세션 스냅샷 ---
+SNAPSHOT_INTERVAL_MS = 30_000
+SNAPSHOT_PATH = os.environ.get("PET_SNAPSHOT", "")  # 비우면 사용자 설정 폴더의 session.json
+DEFERRED_LOAD_MS     = 15     # 미뤄 둔 액션(미리 읽기 후보, 복원된 펫의 나머지)을 하나씩 로드하는 간격
+
+# --- 다음 액션 미리 읽기 ---
+PREFETCH_QUEUE    = 12    # 대기열 길이 — 넘치면 오래된(덜 급한) 후보부터 버린다
+PREFETCH_TOP      = 2     # 전이 통계에서 고르는 후보 수
+PREFETCH_MIN_SEEN = 2     # 이만큼 본 전이만 통계 후보로 쓴다
+PREFETCH_SCALED   = 2     # indexed 저장에서 펼쳐 두는 액션 수 — 지금 액션 + 가장 유력한 다음 후보
+
+# --- 개발용 에셋 핫 리로드 ---
+# PET_DEV_RELOAD=1 이면 캐릭터 폴더를 감시해서 바뀐 액션만 다시 디코딩해 살아있는 펫에 바로 반영
+DEV_RELOAD          = os.environ.get("PET_DEV_RELOAD", "") == "1"
+DEV_RELOAD_DEBOUNCE = 300    # ms — 저장 중 여러 번 오는 변경 알림을 한 번으로 묶는다
+
 ACTIONS = {
     "idle": "idle/idle.gif",
     "walk_left": "walk_left/walk_left.gif",
@@ -86,6 +151,80 @@ ACTIONS = {
     "fall_right": "fall_right/fall_right.gif",
 }
 
+# =======================
+# 펫 상태 (모드)
+# =======================
+class PetState(IntEnum):
+    NORMAL        = 0
+    DANCE         = 1
+    SLEEP         = 2
+    EXERCISE      = 3
+    CLEANING      = 4
+    GAME_SNACK    = 5
+    GAME_OBSTACLE = 6
+    GAME_HEADING  = 7
+    GAME_MULTIBALL = 8
+
+    @property
+    def label(self):
+        return self.name.lower()
+
+# 자세가 고정되는 모드 — 물리/랜덤이동/클릭 반응을 막는다
+POSED_STATES = frozenset({PetState.DANCE, PetState.SLEEP, PetState.EXERCISE, PetState.CLEANING})
+GAME_STATES  = frozenset({PetState.GAME_SNACK, PetState.GAME_OBSTACLE, PetState.GAME_HEADING,
+                          PetState.GAME_MULTIBALL})
+
+# 허용되는 전이. 모드끼리 바로 넘어가지 않고 항상 NORMAL 을 거친다 (_exit_modes)
+STATE_TRANSITIONS = {st: frozenset({PetState.NORMAL}) for st in PetState}
+STATE_TRANSITIONS[PetState.NORMAL] = frozenset(PetState)
+
+# 상태별 update_loop / game_timer 핸들러 (Pet 메서드 이름) — 상태가 바뀔 때 한 번만 찾는다
+STATE_TICK = {
+    PetState.NORMAL:        "_tick_normal",
+    PetState.DANCE:         "_tick_posed",
+    PetState.SLEEP:         "_tick_posed",
+    PetState.EXERCISE:      "_tick_posed",
+    PetState.CLEANING:      "_tick_cleaning",
+    PetState.GAME_SNACK:    "_tick_game",
+    PetState.GAME_OBSTACLE: "_tick_game",
+    PetState.GAME_HEADING:  "_tick_game",
+    PetState.GAME_MULTIBALL: "_tick_game",
+}
+STATE_GAME_TICK = {
+    PetState.GAME_SNACK:    "_game_snack_tick",
+    PetState.GAME_OBSTACLE: "_game_obstacle_tick",
+    PetState.GAME_HEADING:  "_game_heading_tick",
+    PetState.GAME_MULTIBALL: "_game_multiball_tick",
+}
+
+# assets/<캐릭터>/character.json — {"actions": {키: 상대경로}}, 없으면 ACTIONS 배치
+CHAR_MANIFEST = "character.json"
+
+# 호출 지점이 정해 둔 다음 액션 — 전이 통계가 쌓이기 전에도 미리 읽는다
+# (운동 순서는 Pet.exercise_cycle 에서 따로 채운다)
+ACTION_NEXT_HINTS = {
+    "idle":        ("surprise", "angry"),
+    "walk_left":   ("fall_left", "run_left", "jump"),
+    "walk_right":  ("fall_right", "run_right", "jump"),
+    "run_left":    ("walk_left", "jump"),
+    "run_right":   ("walk_right", "jump"),
+    "jump":        ("walk_left", "walk_right"),
+    "fall_left":   ("walk_left",),
+    "fall_right":  ("walk_right",),
+    "climb_left":  ("hang",),
+    "climb_right": ("hang",),
+    "clean_left":  ("clean_right",),
+    "clean_right": ("clean_left",),
+}
+# 모드에 들어갈 때 그 모드가 나중에 쓸 액션
+STATE_PREFETCH = {
+    PetState.CLEANING:       ("mopping", "clean_dust", "clean_left", "clean_right"),
+    PetState.GAME_SNACK:     ("angry",),
+    PetState.GAME_OBSTACLE:  ("fall_right",),
+    PetState.GAME_HEADING:   ("angry",),
+    PetState.GAME_MULTIBALL: ("angry",),
+}
+
 # 바닥에 강제 안 붙여도 되는 모션들
 FLOOR_SNAP_EXCLUDE = {
     "climb_left", "climb_right", "hang",
@@ -93,6 +232,15 @@ FLOOR_SNAP_EXCLUDE = {
 }
 
 
+def chroma_mask(pix: QtGui.QPixmap) -> QtGui.QRegion:
+    return QtGui.QRegion(pix.createMaskFromColor(QtGui.QColor(255,255,255), QtCore.Qt.MaskOutColor))
+
+
+def smooth_variant(rel: str) -> str:
+    p = Path(rel)
+    return (p.parent / f"{p.stem}{SMOOTH_SUFFIX}{p.suffix}").as_posix()
+
+
 def desktop_virtual_rect():
     app = QtWidgets.QApplication.instance()
     if app and app.primaryScreen():
@@ -101,6 +249,947 @@ def desktop_virtual_rect():
     return scr.virtualGeometry() if scr else QtCore.QRect(0, 0, 1920, 1080)
 
 
+_INDEX_KEY = 0xff01fe03   # 투명 픽셀 자리에 채우는 색 — 실제 프레임에 쓰였으면 변환이 실패할 뿐
+
+
+def to_indexed(img: QtGui.QImage):
+    # 프레임에 실제로 쓰인 색(256개 이하)으로 팔레트를 만들어 손실 없이 8bit 로. 안 되면 None.
+    # 불투명 RGB32 는 Qt 가 256색 이하일 때 양자화 없이 그 색들로 팔레트를 만든다 —
+    # 투명 픽셀을 키 색으로 채워 변환한 뒤 팔레트의 키 색만 투명으로 되돌리고, 원본과 비교해 확인
+    if img.isNull():
+        return None
+    src = img.convertToFormat(QtGui.QImage.Format_ARGB32_Premultiplied)
+    rgb = QtGui.QImage(src.size(), QtGui.QImage.Format_RGB32)
+    rgb.fill(_INDEX_KEY)
+    p = QtGui.QPainter(rgb)
+    p.drawImage(0, 0, src)
+    p.end()
+    idx = rgb.convertToFormat(QtGui.QImage.Format_Indexed8, QtCore.Qt.ThresholdDither)
+    idx.setColorTable([0 if c == _INDEX_KEY else c for c in idx.colorTable()])
+    if idx.convertToFormat(QtGui.QImage.Format_ARGB32_Premultiplied) != src:
+        return None     # 색이 256개 넘게 양자화됐거나 반투명 픽셀이 있음
+    return idx
+
+
+def to_raw_frame(img: QtGui.QImage):
+    if FRAME_STORAGE != "indexed":
+        return QtGui.QPixmap.fromImage(img)
+    if img.format() == QtGui.QImage.Format_Indexed8:
+        return img      # 팩에서 읽은 팔레트 프레임
+    # GIF 프레임은 256색 이하라 보통 그대로 들어간다. 색이 더 많으면 32bit 로 둔다
+    idx = to_indexed(img)
+    if idx is None:
+        return img.convertToFormat(QtGui.QImage.Format_ARGB32_Premultiplied)
+    return idx
+
+
+_HIT_TABLE = bytes(0x31 if a >= HIT_ALPHA_MIN else 0x30 for a in range(256))
+
+
+class HitMask:
+    # 프레임 알파를 1bit 로 줄인 판정 마스크. 행마다 비트를 파이썬 정수 하나에 담는다
+    __slots__ = ("w", "h", "rows")
+
+    def __init__(self, pix: QtGui.QPixmap):
+        img = pix.toImage().convertToFormat(QtGui.QImage.Format_Alpha8)
+        self.w, self.h = img.width(), img.height()
+        bpl = img.bytesPerLine()
+        data = bytes(img.constBits().asarray(img.sizeInBytes()))
+        self.rows = [int(data[y*bpl:y*bpl + self.w].translate(_HIT_TABLE) or b"0", 2)
+                     for y in range(self.h)]
+
+    def hit(self, x: int, y: int) -> bool:
+        if x < 0 or y < 0 or x >= self.w or y >= self.h:
+            return False
+        return (self.rows[y] >> (self.w - 1 - x)) & 1 == 1
+
+
+def thin_frames(raw, period: float = FRAME_MIN_HOLD):
+    # 재생 시작부터 period 간격으로 표본을 찍을 때 한 번도 걸리지 않는 프레임은 버리고
+    # 그 지연을 앞 프레임에 합친다. 전체 길이는 그대로 유지된다.
+    if len(raw) < 2:
+        return raw
+    out = []
+    t = 0.0
+    next_sample = 0.0
+    for pm, d in raw:
+        end = t + d
+        if end > next_sample or not out:
+            out.append([pm, d])
+            while next_sample < end:
+                next_sample += period
+        else:
+            out[-1][1] += d
+        t = end
+    if len(out) == len(raw):
+        return raw
+    return [(pm, d) for pm, d in out]
+
+
+def frame_timeline(raw):
+    # 프레임별 누적 종료 시각 — elapsed 로 bisect 하면 그 시점의 프레임 번호
+    if not raw:
+        return [0.05], 0.05
+    ends = []
+    t = 0.0
+    for _pm, d in raw:
+        t += max(d, 1e-3)
+        ends.append(t)
+    return ends, t
+
+
+# blank=False 면 프레임이 하나도 없을 때 빈 자리표시 프레임 대신 None 을 돌려준다 (핫 리로드용)
+def decode_gif(path, blank: bool = True):
+    movie = QtGui.QMovie(path)
+    frames = []
+    delays = []
+    max_w = 1; max_h = 1
+    idx = 0
+    while True:
+        if not movie.jumpToFrame(idx):
+            break
+        img = movie.currentImage()
+        if img.isNull():
+            break
+        w, h = img.width(), img.height()
+        max_w = max(max_w, w); max_h = max(max_h, h)
+        frames.append(to_raw_frame(img))
+        d = movie.nextFrameDelay()
+        if d <= 0: d = MIN_FRAME_DELAY
+        delays.append(d/1000.0)
+        idx += 1
+    if not frames:
+        if not blank:
+            return None
+        pm = QtGui.QPixmap(64,64); pm.fill(QtCore.Qt.transparent)
+        return [pm], [0.05], 64, 64
+    return frames, delays, max_w, max_h
+
+
+def decode_pack(pack: AssetPack, action: str):
+    res = pack.decode(action)
+    if res is None:
+        pm = QtGui.QPixmap(64,64); pm.fill(QtCore.Qt.transparent)
+        return [pm], [0.05], 64, 64
+    images, delays, mw, mh = res
+    converted = {}
+    frames = []
+    for img in images:
+        # 중복 프레임은 같은 QImage 를 가리키므로 변환도 한 번만 한다
+        pm = converted.get(id(img))
+        if pm is None:
+            pm = converted[id(img)] = to_raw_frame(img)
+        frames.append(pm)
+    return frames, delays, mw, mh
+
+
+def decode_png_folder(folder: Path, blank: bool = True):
+    if not folder.exists():
+        if not blank:
+            return None
+        pm = QtGui.QPixmap(64,64); pm.fill(QtCore.Qt.transparent)
+        return [pm], [0.05], 64, 64
+    files = sorted([p for p in folder.iterdir()
+                    if p.suffix.lower() in (".png",".webp",".jpg",".jpeg")],
+                   key=lambda p: p.name)
+    if not files:
+        if not blank:
+            return None
+        pm = QtGui.QPixmap(64,64); pm.fill(QtCore.Qt.transparent)
+        return [pm], [0.05], 64, 64
+    frames, delays = [], []
+    max_w = 1; max_h = 1
+    for p in files:
+        img = QtGui.QImage(p.as_posix())
+        if img.isNull(): continue
+        pm = to_raw_frame(img)
+        w, h = pm.width(), pm.height()
+        max_w = max(max_w, w); max_h = max(max_h, h)
+        frames.append(pm); delays.append(0.05)
+    if not frames and not blank:
+        return None
+    return frames, delays, max_w, max_h
+
+
+class LazyScaledCache:
+    # 스케일된 프레임을 최근 capacity 개 액션만 들고 있는 animations 대체용 매핑
+    def __init__(self, raw: dict, build, capacity: int = 1):
+        self._raw = raw
+        self._build = build
+        self._capacity = capacity
+        self._items = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._raw
+
+    def __getitem__(self, key):
+        frames = self._items.get(key)
+        if frames is None:
+            frames = self._build(self._raw[key])
+            self[key] = frames
+        else:
+            self._items.move_to_end(key)
+        return frames
+
+    def __setitem__(self, key, frames):
+        self._items[key] = frames
+        self._items.move_to_end(key)
+        while len(self._items) > self._capacity:
+            self._items.popitem(last=False)
+
+    def get(self, key, default=None):
+        return self[key] if key in self._raw else default
+
+    def peek(self, key):
+        return self._items.get(key)
+
+    def discard(self, key):
+        self._items.pop(key, None)
+
+
+# ==========================
+# 캐릭터 에셋 — 캐릭터별 액션 표, 디코딩 결과 공유, 레지스트리
+# ==========================
+def frame_nbytes(pm) -> int:
+    if isinstance(pm, QtGui.QImage):
+        return pm.sizeInBytes()
+    return pm.width() * pm.height() * max(1, pm.depth()) // 8
+
+
+def load_char_actions(d: Path):
+    # 캐릭터 폴더의 액션 표. 캐릭터 폴더가 아니면 None
+    try:
+        data = json.loads((d / CHAR_MANIFEST).read_text(encoding="utf-8"))
+    except OSError:
+        data = None
+    except ValueError:
+        return None
+    if data is not None:
+        actions = data.get("actions")
+        if not isinstance(actions, dict) or not actions:
+            return None
+        return {str(k): str(v) for k, v in actions.items()}
+    # 매니페스트가 없으면 기본 배치(ACTIONS)의 idle 이 있어야 캐릭터로 본다
+    if (d / PACK_FILE).exists() or (d / ACTIONS["idle"]).parent.is_dir():
+        return dict(ACTIONS)
+    return None
+
+
+def find_archive():
+    # 배포용 단일 에셋 아카이브: PET_ARCHIVE → (frozen 빌드) exe 옆 → 에셋 루트 안
+    # (build_assets.py --archive 의 기본 출력 위치와 같은 ASSETS_DIR)
+    cands = []
+    if os.environ.get("PET_ARCHIVE"):
+        cands.append(Path(os.environ["PET_ARCHIVE"]))
+    if getattr(sys, "frozen", False):
+        cands.append(Path(sys.executable).resolve().parent / ARCHIVE_FILE)
+    cands.append(ASSETS_DIR / ARCHIVE_FILE)
+    for path in cands:
+        archive = AssetArchive.open(path)
+        if archive is not None:
+            return archive
+    return None
+
+
+class Character:
+    # 캐릭터 하나의 에셋. 디코딩한 원본 프레임은 이 캐릭터의 모든 펫이 같이 쓴다
+    def __init__(self, name: str, base: Path, actions: dict, pack: AssetPack = None):
+        self.name = name
+        self.base = base
+        self.actions = actions
+        self.frames = {}     # 액션(변형) 키 → (raw 목록, (max_w, max_h))
+        self.nbytes = 0
+        self.decodes = 0
+        self.transitions = {}   # 이전 액션 → {다음 액션: 횟수} (이 캐릭터의 모든 펫 합산)
+        self._pack = False if pack is None else pack   # False: 아직 안 열어 봄
+
+    @property
+    def pack(self):
+        if self._pack is False:
+            # build_assets.py 로 만든 팩이 있으면 GIF 디코딩 대신 사용
+            self._pack = AssetPack.open(self.base / PACK_FILE, self.name)
+        return self._pack
+
+    def source(self, action):
+        rel = self.actions.get(action)
+        return None if rel is None else self.base / rel
+
+    def note_transition(self, prev, key):
+        if prev is None or prev == key:
+            return
+        row = self.transitions.setdefault(prev, {})
+        row[key] = row.get(key, 0) + 1
+
+    def likely_next(self, action, n: int):
+        row = self.transitions.get(action)
+        if not row:
+            return []
+        best = sorted(row.items(), key=lambda kv: -kv[1])[:n]
+        return [k for k, c in best if c >= PREFETCH_MIN_SEEN]
+
+    def key_source(self, key):
+        # 캐시 키(액션 또는 "<액션>_smooth") → 원본 경로
+        if key.endswith(SMOOTH_SUFFIX):
+            rel = self.actions.get(key[:-len(SMOOTH_SUFFIX)])
+            return None if rel is None else self.base / smooth_variant(rel)
+        return self.source(key)
+
+    def reload(self, key):
+        # 핫 리로드: 팩은 건너뛰고 원본에서 이 키만 다시 디코딩해 통째로 바꿔 끼운다.
+        # 저장 도중이라 읽을 프레임이 없으면 예전 프레임을 그대로 두고 None — 다음 변경 때 다시 시도한다
+        path = self.key_source(key)
+        if path is None:
+            return None
+        try:
+            if path.exists():
+                res = decode_gif(str(path), blank=False)
+            else:
+                res = decode_png_folder(path.parent, blank=False)
+        except Exception as e:
+            res, why = None, f"실패 ({e})"
+        else:
+            why = "프레임 없음"
+        if res is None:
+            if sys.stderr:
+                print(f"reload {self.name}/{key}: {why}, 이전 프레임 유지", file=sys.stderr)
+            return None
+        frames, delays, mw, mh = res
+        return self.store(key, list(zip(frames, delays)), (mw, mh))
+
+    def attach(self, key, raw, size):
+        # 다른 프로세스가 디코딩해 공유 메모리에 둔 프레임 — 이 프로세스 메모리로 세지 않는다
+        self.frames[key] = (raw, size)
+
+    def load(self, key, gif_path: Path):
+        cached = self.frames.get(key)
+        if cached is None:
+            frames, delays, mw, mh = self.decode(key, gif_path)
+            cached = self.store(key, list(zip(frames, delays)), (mw, mh))
+        return cached
+
+    def decode(self, key, gif_path: Path):
+        pack = self.pack
+        if pack and pack.is_fresh(key, gif_path):
+            return decode_pack(pack, key)
+        if gif_path.exists():
+            return decode_gif(str(gif_path))
+        return decode_png_folder(gif_path.parent)
+
+    def preload(self):
+        # 모든 액션을 미리 디코딩. 프로세스 백엔드면 팩에 없는 GIF 를 워커들에 나눠 준다
+        pack = self.pack
+        if DECODE_BACKEND == "process" and parallel_decode.available():
+            jobs = {action: self.source(action) for action in self.actions
+                    if action not in self.frames
+                    and not (pack and pack.is_fresh(action, self.source(action)))
+                    and self.source(action).exists()}
+            if jobs:
+                for action, (frames, delays, mw, mh) in self._decode_parallel(jobs).items():
+                    self.store(action, list(zip(frames, delays)), (mw, mh))
+        for action in self.actions:
+            self.load(action, self.source(action))
+
+    @staticmethod
+    def _decode_parallel(jobs: dict):
+        out = {}
+        for action, dec in parallel_decode.decode_parallel(jobs):
+            if dec is None or not dec.n:
+                continue    # 실패한 액션은 load() 에서 QMovie 로 다시 시도
+            frames = []
+            for i in range(dec.n):
+                img = QtGui.QImage(dec.frame_view(i), dec.w, dec.h, dec.w*4, QtGui.QImage.Format_RGBA8888)
+                frames.append(to_raw_frame(img))
+                del img
+            out[action] = (frames, dec.delays, dec.w, dec.h)
+        return out
+
+    def store(self, key, raw, size):
+        old = self.frames.get(key)
+        if old is not None:
+            self.nbytes -= self._raw_nbytes(old[0])
+        raw = thin_frames(raw)
+        self.frames[key] = (raw, size)
+        self.nbytes += self._raw_nbytes(raw)
+        self.decodes += 1
+        return self.frames[key]
+
+    @staticmethod
+    def _raw_nbytes(raw):
+        # 팩에서 중복 제거된 프레임은 같은 객체를 가리키므로 한 번만 센다
+        seen = {id(pm): pm for (pm, _d) in raw}
+        return sum(frame_nbytes(pm) for pm in seen.values())
+
+
+class SharedFrameStore:
+    # 캐릭터 하나의 원본 프레임 전부를 공유 메모리 블록 하나에 ARGB32 Premultiplied 로 모은 것.
+    # 조정자가 만들고(build) 워커는 붙어서(attach) 복사 없이 QImage 로 감싸 쓴다
+    def __init__(self, shm, manifest: dict, owner: bool):
+        self.shm = shm
+        self.manifest = manifest    # 키 → {"size": [w, h], "frames": [[offset, w, h, delay]]}
+        self.owner = owner
+        self._views = []
+
+    @classmethod
+    def build(cls, char: Character):
+        char.preload()
+        manifest, offsets, images = {}, {}, {}
+        total = 0
+        for key, (raw, size) in char.frames.items():
+            ents = []
+            for pm, d in raw:
+                off = offsets.get(id(pm))
+                if off is None:
+                    img = pm if isinstance(pm, QtGui.QImage) else pm.toImage()
+                    img = img.convertToFormat(QtGui.QImage.Format_ARGB32_Premultiplied)
+                    off = offsets[id(pm)] = total
+                    images[off] = img
+                    total += img.width() * img.height() * 4
+                img = images[off]
+                ents.append([off, img.width(), img.height(), d])
+            manifest[key] = {"size": list(size), "frames": ents}
+        shm = shared_memory.SharedMemory(create=True, size=max(1, total))
+        for off, img in images.items():
+            n = img.width() * img.height() * 4
+            shm.buf[off:off + n] = bytes(img.constBits().asarray(n))
+        # 조정자는 펫을 띄우지 않으므로 자기 쪽 디코딩 결과는 버린다
+        char.frames.clear()
+        char.nbytes = 0
+        return cls(shm, manifest, owner=True)
+
+    @classmethod
+    def attach(cls, name: str, manifest: dict):
+        # spawn 워커는 조정자의 resource tracker 를 같이 쓴다. 여기서 unregister 하면 조정자의
+        # 등록까지 지워져서, 조정자가 비정상 종료할 때 블록이 /dev/shm 에 남는다
+        shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, manifest, owner=False)
+
+    def install(self, char: Character):
+        images = {}
+        for key, ent in self.manifest.items():
+            raw = []
+            for off, w, h, d in ent["frames"]:
+                img = images.get(off)
+                if img is None:
+                    view = self.shm.buf[off:off + w*h*4]
+                    self._views.append(view)
+                    img = images[off] = QtGui.QImage(view, w, h, w*4, QtGui.QImage.Format_ARGB32_Premultiplied)
+                raw.append((img, d))
+            char.attach(key, raw, tuple(ent["size"]))
+
+    def close(self):
+        for v in self._views:
+            v.release()
+        self._views = []
+        try:
+            self.shm.close()
+        except BufferError:
+            pass    # 아직 QImage 가 버퍼를 잡고 있으면 매핑은 GC 때 풀린다
+        if self.owner:
+            self.shm.unlink()
+
+
+class CharacterRegistry:
+    def __init__(self, root: Path, archive: AssetArchive = None):
+        self.root = root
+        self.archive = archive
+        self.chars = {}
+        self.discover()
+
+    def discover(self):
+        # 아카이브에 든 캐릭터가 먼저. 같은 이름의 폴더가 있으면 원본 GIF 가 바뀐 액션만 폴더에서 읽는다
+        if self.archive is not None:
+            for name, actions in self.archive.chars().items():
+                if name not in self.chars and actions:
+                    self.chars[name] = Character(name, self.root / name, actions,
+                                                 pack=self.archive.pack(name))
+        if self.root.is_dir():
+            for d in sorted(self.root.iterdir()):
+                if not d.is_dir() or d.name in self.chars:
+                    continue
+                actions = load_char_actions(d)
+                if actions is None:
+                    continue
+                self.chars[d.name] = Character(d.name, d, actions)
+        if not self.chars:
+            self.chars[CHAR_NAME] = Character(CHAR_NAME, self.root / CHAR_NAME, dict(ACTIONS))
+
+    def get(self, name):
+        return self.chars.get(name)
+
+    @property
+    def default(self):
+        return self.chars.get(CHAR_NAME) or next(iter(self.chars.values()))
+
+    def names(self):
+        return list(self.chars)
+
+    def summary(self):
+        lines = ["캐릭터별 원본 프레임 메모리"]
+        for ch in self.chars.values():
+            if ch.frames:
+                lines.append(f"  {ch.name:<12} {len(ch.frames):>3} actions  {ch.decodes:>3} decodes"
+                             f"  {ch.nbytes / 1e6:7.1f} MB")
+        return "\n".join(lines)
+
+
+# ==========================
+# 시계/커서/타이머 — 기록·재생 하네스(replay.py)가 통째로 바꿔 끼운다
+# ==========================
+class Session:
+    Timer = QtCore.QTimer
+
+    def now(self) -> float:
+        return time.monotonic()
+
+    def cursor_pos(self) -> QtCore.QPoint:
+        return QtGui.QCursor.pos()
+
+    def record(self, ev: str, **fields):
+        pass
+
+    def close(self):
+        pass
+
+
+class RecordingSession(Session):
+    # PET_RECORD=경로 : 시드, 입력, 커서 샘플, 품질 단계 변화를 JSONL 로 기록
+    def __init__(self, path: str, app):
+        self.f = open(path, "w", encoding="utf-8", buffering=1)
+        self.t0 = time.monotonic()
+        self.seed = random.randrange(1 << 32)
+        random.seed(self.seed)
+        self._last_cursor = None
+        screens = [[g.x(), g.y(), g.width(), g.height()]
+                   for g in (scr.availableGeometry() for scr in app.screens())]
+        self.record("start", seed=self.seed, screens=screens)
+
+    def record(self, ev: str, **fields):
+        if self.f is None:
+            return
+        fields["t"] = round(time.monotonic() - self.t0, 4)
+        fields["ev"] = ev
+        self.f.write(json.dumps(fields, separators=(",", ":")) + "\n")
+
+    def cursor_pos(self) -> QtCore.QPoint:
+        p = QtGui.QCursor.pos()
+        xy = (p.x(), p.y())
+        if xy != self._last_cursor:
+            self._last_cursor = xy
+            self.record("cursor", x=xy[0], y=xy[1])
+        return p
+
+    def close(self):
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+
+
+session = Session()
+
+
+def _cursor_x():
+    # petsim.World 가 따라가기 모드에서만 부르는 커서 x (기록 세션이면 샘플로 남는다)
+    return session.cursor_pos().x()
+
+
+class TraceRecorder:
+    # 끝난 구간만 (이름, 레인, 시작, 길이, 인자) 로 고정 크기 링 버퍼에 남긴다.
+    # 레인은 trace 의 tid — 0 은 캐릭터 공유 작업(디코딩), 펫은 pid + 1
+    def __init__(self, path: str, capacity: int = TRACE_EVENTS):
+        self.path = path
+        self.events = deque(maxlen=capacity)
+        self.total = 0
+        self.t0 = time.perf_counter()
+
+    def span(self, name, lane, t0, args=None):
+        self.events.append((name, lane, t0, time.perf_counter() - t0, args))
+        self.total += 1
+
+    def dump(self, path: str = None):
+        path = path or self.path
+        pid = os.getpid()
+        out = [{"ph": "M", "name": "process_name", "pid": pid, "args": {"name": f"pet {pid}"}}]
+        lanes = set()
+        for name, lane, t0, dur, args in list(self.events):
+            ev = {"ph": "X", "name": name, "pid": pid, "tid": lane,
+                  "ts": round((t0 - self.t0) * 1e6, 1), "dur": round(dur * 1e6, 1)}
+            if args:
+                ev["args"] = args
+            out.append(ev)
+            lanes.add(lane)
+        for lane in sorted(lanes):
+            out.append({"ph": "M", "name": "thread_name", "pid": pid, "tid": lane,
+                        "args": {"name": "decode" if lane == 0 else f"pet {lane - 1}"}})
+            out.append({"ph": "M", "name": "thread_sort_index", "pid": pid, "tid": lane,
+                        "args": {"sort_index": lane}})
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": out, "displayTimeUnit": "ms",
+                       "otherData": {"dropped": self.total - len(self.events)}}, f)
+        os.replace(tmp, path)
+        return path, len(self.events)
+
+
+class PetLabel(QtWidgets.QLabel):
+    # 트레이스를 켜면 install_tracer 가 paintEvent 를 감싸는 자리. 꺼져 있으면 QLabel 그대로
+    pass
+
+
+tracer = None
+
+
+def _traced(name, fn, lane, args=None):
+    @functools.wraps(fn)
+    def inner(*a, **kw):
+        t0 = time.perf_counter()
+        try:
+            return fn(*a, **kw)
+        finally:
+            tracer.span(name, lane(a), t0, args(a) if args else None)
+    return inner
+
+
+def install_tracer(path: str):
+    # 꺼져 있을 때 비용이 없도록 켤 때만 감싼다. 펫을 만들기 전에 불러야 한다
+    global tracer
+    if tracer is not None:
+        return tracer
+    tracer = TraceRecorder(path)
+    g = globals()
+    for fn in ("decode_gif", "decode_pack", "decode_png_folder"):
+        g[fn] = _traced(fn, g[fn], lambda a: 0, lambda a: {"src": str(a[-1])})
+    pet_lane = lambda a: a[0].pid + 1
+    # 실제 그리기는 펫 창의 라벨이 한다 — _commit_geometry 는 setPixmap/이동만 하고 update 를 예약할 뿐
+    PetLabel.paintEvent = _traced("paint", QtWidgets.QLabel.paintEvent,
+                                  lambda a: a[0].parent().pid + 1)
+    for meth in ("update_loop", "_rebuild_scaled_cache", "_apply_frame", "_commit_geometry",
+                 "contextMenuEvent"):
+        setattr(Pet, meth, _traced(meth, getattr(Pet, meth), pet_lane))
+    Pet._game_tick = _traced("_game_tick", Pet._game_tick, pet_lane,
+                             lambda a: {"game": a[0].state.label})
+    return tracer
+
+
+# ==========================
+# 프레임 타이밍 통계
+# ==========================
+class FrameHistogram:
+    __slots__ = ("bin_ms", "bins", "count", "total_ms", "max_ms", "late")
+
+    def __init__(self, bin_ms: float = FRAME_STATS_BIN_MS):
+        self.bin_ms = bin_ms
+        self.bins = [0] * (FRAME_STATS_BINS + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.late = 0
+
+    def add(self, ms: float):
+        i = int(ms / self.bin_ms)
+        if i < 0:
+            i = 0
+        elif i > FRAME_STATS_BINS:
+            i = FRAME_STATS_BINS
+        self.bins[i] += 1
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def percentile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        acc = 0
+        for i, c in enumerate(self.bins):
+            acc += c
+            if acc >= target:
+                if i == FRAME_STATS_BINS:
+                    return self.max_ms
+                return min(self.max_ms, (i + 1) * self.bin_ms)
+        return self.max_ms
+
+
+class FrameStats:
+    # 키 = (종류, 펫 수, 모드) → 히스토그램 하나. 펫 수/모드 조합이 유한해서 메모리도 고정
+    KINDS = ("tick", "tick_cost", "anim_late", "game_tick")
+
+    def __init__(self, manager):
+        self.mgr = manager
+        self.hists = {}
+        self._last = {}
+        # 품질 조절용 최근 구간 (take_window 로 가져가면서 초기화)
+        self.window_cost   = FrameHistogram(FRAME_COST_BIN_MS)
+        self.window_frames = 0
+        self.window_late   = 0
+
+    def _hist(self, kind, pet):
+        key = (kind, len(self.mgr.pets), pet.mode)
+        h = self.hists.get(key)
+        if h is None:
+            bin_ms = FRAME_COST_BIN_MS if kind == "tick_cost" else FRAME_STATS_BIN_MS
+            h = self.hists[key] = FrameHistogram(bin_ms)
+        return h
+
+    def interval(self, kind, pet, now: float):
+        k = (kind, id(pet))
+        last = self._last.get(k)
+        self._last[k] = now
+        if last is not None:
+            self._hist(kind, pet).add((now - last) * 1000.0)
+
+    def lateness(self, pet, late_sec: float):
+        ms = max(0.0, late_sec * 1000.0)
+        h = self._hist("anim_late", pet)
+        h.add(ms)
+        self.window_frames += 1
+        if ms > FRAME_LATE_MS:
+            h.late += 1
+            self.window_late += 1
+
+    def cost(self, pet, ms: float):
+        self._hist("tick_cost", pet).add(ms)
+        self.window_cost.add(ms)
+
+    def take_window(self):
+        win = (self.window_cost, self.window_frames, self.window_late)
+        self.window_cost   = FrameHistogram(FRAME_COST_BIN_MS)
+        self.window_frames = 0
+        self.window_late   = 0
+        return win
+
+    def reset_timer(self, kind, pet):
+        self._last.pop((kind, id(pet)), None)
+
+    def forget(self, pet):
+        for kind in self.KINDS:
+            self._last.pop((kind, id(pet)), None)
+
+    def summary(self) -> str:
+        if not self.hists:
+            return "프레임 통계 없음"
+        lines = [f"{'kind':<10}{'pets':>5} {'mode':<14}{'n':>8}{'p50':>8}{'p95':>8}{'p99':>8}{'max':>8}{'late':>7}"]
+        for key in sorted(self.hists):
+            kind, n_pets, mode = key
+            h = self.hists[key]
+            late = str(h.late) if kind == "anim_late" else "-"
+            lines.append(
+                f"{kind:<10}{n_pets:>5} {mode:<14}{h.count:>8}"
+                f"{h.percentile(0.50):>8.1f}{h.percentile(0.95):>8.1f}"
+                f"{h.percentile(0.99):>8.1f}{h.max_ms:>8.1f}{late:>7}"
+            )
+        return "\n".join(lines)
+
+
+# ==========================
+# 품질 조절
+# ==========================
+class QualityGovernor(QtCore.QObject):
+    def __init__(self, manager):
+        super().__init__()
+        self.mgr = manager
+        self.level = QUALITY_START
+        self._pressure = 0
+        self._headroom = 0
+        self.timer = session.Timer(self)
+        self.timer.setInterval(QUALITY_INTERVAL_MS)
+        self.timer.timeout.connect(self._evaluate)
+        self.timer.start()
+
+    @property
+    def display_fps(self):
+        return QUALITY_LEVELS[self.level][0]
+
+    @property
+    def variant(self):
+        return QUALITY_LEVELS[self.level][1]
+
+    @property
+    def transform(self):
+        return QUALITY_LEVELS[self.level][2]
+
+    @property
+    def busy(self):
+        # 직전 평가 구간이 예산을 넘었다 — 급하지 않은 로드는 다음 구간으로 미룬다
+        return self._pressure > 0
+
+    def _evaluate(self):
+        cost, frames, late = self.mgr.frame_stats.take_window()
+        n = len(self.mgr.pets)
+        if not n or not cost.count:
+            return
+        load = cost.percentile(0.95) * n
+        late_ratio = late / frames if frames else 0.0
+        if load > QUALITY_BUDGET_MS or late_ratio > QUALITY_LATE_RATIO:
+            self._pressure += 1
+            self._headroom = 0
+        elif load < QUALITY_BUDGET_MS * 0.4 and late_ratio < QUALITY_LATE_RATIO * 0.25:
+            self._headroom += 1
+            self._pressure = 0
+        else:
+            self._pressure = 0
+            self._headroom = 0
+
+        if self._pressure >= QUALITY_DOWN_AFTER and self.level < len(QUALITY_LEVELS) - 1:
+            self.set_level(self.level + 1)
+        elif self._headroom >= QUALITY_UP_AFTER and self.level > 0:
+            self.set_level(self.level - 1)
+
+    def set_level(self, level: int):
+        self.level = max(0, min(len(QUALITY_LEVELS) - 1, level))
+        session.record("quality", level=self.level)
+        self._pressure = 0
+        self._headroom = 0
+        for pet in self.mgr.pets:
+            pet._apply_quality()
+
+
+# ==========================
+# 화면 배치 인덱스
+# ==========================
+class ScreenIndex(QtCore.QObject):
+    # 모든 화면의 availableGeometry 를 x 구간으로 잘라 둔 표.
+    # 구간마다 바닥(가장 낮은 bottom)·천장·벽(이어진 구간의 양 끝)을 미리 계산해서
+    # 가상 데스크톱 모드의 "x 에서의 바닥/벽" 영역(span_rect_at)을 bisect 한 번으로 답한다.
+    # 화면 변경 신호가 올 때만 다시 만든다.
+    changed = QtCore.pyqtSignal()
+
+    def __init__(self, app):
+        super().__init__()
+        self.app = app
+        self._hooked = set()
+        app.screenAdded.connect(self._on_screen_added)
+        app.screenRemoved.connect(lambda _scr: self.rebuild())
+        app.primaryScreenChanged.connect(lambda _scr: self.rebuild())
+        for scr in app.screens():
+            self._hook(scr)
+        self.rebuild()
+
+    def _hook(self, scr):
+        if id(scr) in self._hooked:
+            return
+        self._hooked.add(id(scr))
+        scr.availableGeometryChanged.connect(lambda _g: self.rebuild())
+
+    def _on_screen_added(self, scr):
+        self._hook(scr)
+        self.rebuild()
+
+    def rebuild(self):
+        rects = [scr.availableGeometry() for scr in self.app.screens()]
+        if not rects:
+            rects = [QtCore.QRect(0, 0, 1920, 1080)]
+        self.rects = rects
+        self.full_rects = [scr.geometry() for scr in self.app.screens()] or rects
+        edges = sorted({r.x() for r in rects} | {r.x() + r.width() for r in rects})
+        self.starts, self.ends, self.tops, self.floors = [], [], [], []
+        for x0, x1 in zip(edges, edges[1:]):
+            cover = [r for r in rects if r.x() <= x0 and x0 < r.x() + r.width()]
+            if not cover:
+                continue    # 화면 사이 틈
+            self.starts.append(x0)
+            self.ends.append(x1)
+            self.tops.append(min(r.y() for r in cover))
+            self.floors.append(max(r.y() + r.height() for r in cover))
+        # 틈 없이 이어진 구간끼리 같은 벽을 쓴다
+        self.left_wall, self.right_wall, self.run_top = [], [], []
+        i = 0
+        n = len(self.starts)
+        while i < n:
+            j = i
+            while j + 1 < n and self.starts[j + 1] == self.ends[j]:
+                j += 1
+            top = min(self.tops[i:j + 1])
+            for _ in range(i, j + 1):
+                self.left_wall.append(self.starts[i])
+                self.right_wall.append(self.ends[j])
+                self.run_top.append(top)
+            i = j + 1
+        self.changed.emit()
+
+    def _seg(self, x: int) -> int:
+        i = bisect.bisect_right(self.starts, x) - 1
+        if i < 0:
+            return 0
+        if x >= self.ends[i] and i + 1 < len(self.starts):
+            # 틈 안이면 더 가까운 쪽 구간
+            if self.starts[i + 1] - x < x - self.ends[i] + 1:
+                return i + 1
+        return i
+
+    def span_rect_at(self, x: int) -> QtCore.QRect:
+        # 가상 데스크톱 모드에서 펫이 쓰는 영역: 이어진 화면들의 벽 사이, 바닥은 x 위치 기준
+        i = self._seg(x)
+        left, right, top = self.left_wall[i], self.right_wall[i], self.run_top[i]
+        return QtCore.QRect(left, top, right - left, self.floors[i] - top)
+
+    def on_screen(self, rect: QtCore.QRect) -> bool:
+        return any(r.intersects(rect) for r in self.full_rects)
+
+    def screen_rect_at(self, p: QtCore.QPoint) -> QtCore.QRect:
+        # 점이 든 화면을 작업 표시줄까지 포함한 전체 영역으로 고른 뒤 그 화면의 사용 가능 영역.
+        # 어느 화면에도 없으면(창을 화면 밖으로 끌었을 때) 가장 가까운 화면
+        best, best_d = 0, None
+        for i, r in enumerate(self.full_rects):
+            if r.contains(p):
+                return self.rects[i]
+            dx = max(r.left() - p.x(), 0, p.x() - r.right())
+            dy = max(r.top() - p.y(), 0, p.y() - r.bottom())
+            if best_d is None or dx*dx + dy*dy < best_d:
+                best, best_d = i, dx*dx + dy*dy
+        return self.rects[best]
+
+
+# ==========================
+# 여러 공 헤딩용 공 레이어
+# ==========================
+class BallLayer(QtWidgets.QWidget):
+    # 공 전부를 창 하나에 그린다. 반지름별로 drawPoints 한 번씩 (둥근 굵은 펜)
+    COLOR = QtGui.QColor(255, 255, 255)
+
+    def __init__(self, rect: QtCore.QRect):
+        super().__init__(None, QtCore.Qt.FramelessWindowHint | QtCore.Qt.WindowStaysOnTopHint | QtCore.Qt.Tool)
+        self.setAttribute(QtCore.Qt.WA_TranslucentBackground, True)
+        self.setAttribute(QtCore.Qt.WA_TransparentForMouseEvents, True)
+        self.setWindowFlag(QtCore.Qt.WindowDoesNotAcceptFocus, True)
+        self.setGeometry(rect)
+        self._groups = []       # [(반지름, QPolygonF)]
+        self._dirty = QtCore.QRect()
+
+    def set_balls(self, x, y, r):
+        # x, y, r: 같은 길이의 numpy 배열 (전역 좌표)
+        ox, oy = self.x(), self.y()
+        groups = []
+        for rad in np.unique(r):
+            sel = r == rad
+            poly = QtGui.QPolygonF([QtCore.QPointF(px - ox, py - oy)
+                                    for px, py in zip(x[sel].tolist(), y[sel].tolist())])
+            groups.append((int(rad), poly))
+        self._groups = groups
+        # 이전 위치와 새 위치를 합친 영역만 다시 그린다
+        if len(x):
+            pad = int(r.max()) + 2
+            box = QtCore.QRect(int(x.min()) - ox - pad, int(y.min()) - oy - pad,
+                               int(x.max() - x.min()) + 2*pad, int(y.max() - y.min()) + 2*pad)
+        else:
+            box = QtCore.QRect()
+        self.update(self._dirty.united(box))
+        self._dirty = box
+
+    def paintEvent(self, ev):
+        if not self._groups:
+            return
+        p = QtGui.QPainter(self)
+        p.setRenderHint(QtGui.QPainter.Antialiasing)
+        pen = QtGui.QPen(self.COLOR)
+        pen.setCapStyle(QtCore.Qt.RoundCap)
+        for rad, poly in self._groups:
+            pen.setWidth(rad * 2)
+            p.setPen(pen)
+            p.drawPoints(poly)
+        p.end()
+
+
 # ==========================
 # 전체 화면 오버레이
 # ==========================
@@ -159,27 +1248,143 @@ class FullScreenOverlay(QtWidgets.QWidget):
         self.hide()
 
 
+class AssetWatcher(QtCore.QObject):
+    # 캐릭터 폴더의 GIF/PNG 폴더를 감시하다가 바뀐 (캐릭터, 키) 만 모아서 다시 읽는다
+    def __init__(self, manager):
+        super().__init__(manager)
+        self.mgr = manager
+        self.by_file = {}    # GIF 경로 → [(캐릭터, 키)]
+        self.by_dir = {}     # PNG 폴더 액션의 폴더 경로 → [(캐릭터, 키)]
+        self.pending = {}    # (캐릭터 이름, 키) → 캐릭터
+        self.watcher = QtCore.QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self._on_file)
+        self.watcher.directoryChanged.connect(self._on_dir)
+        self.debounce = session.Timer(self)
+        self.debounce.setSingleShot(True)
+        self.debounce.setInterval(DEV_RELOAD_DEBOUNCE)
+        self.debounce.timeout.connect(self._flush)
+        for char in manager.chars.chars.values():
+            self.watch(char)
+
+    def watch(self, char: Character):
+        if not char.base.is_dir():
+            return
+        dirs = set()
+        for action in char.actions:
+            for key in (action, action + SMOOTH_SUFFIX):
+                path = char.key_source(key)
+                dirs.add(str(path.parent))
+                if path.exists():
+                    self.by_file.setdefault(str(path), []).append((char, key))
+                elif key == action:
+                    self.by_dir.setdefault(str(path.parent), []).append((char, key))
+        # 폴더도 같이 본다 — 편집기가 새 파일로 바꿔치기하면 파일 감시가 풀리기 때문
+        paths = [p for p in list(self.by_file) + sorted(dirs) if os.path.exists(p)]
+        if paths:
+            self.watcher.addPaths(paths)
+
+    def _mark(self, entries):
+        for char, key in entries:
+            self.pending[(char.name, key)] = char
+        self.debounce.start()
+
+    def _on_file(self, path):
+        self._mark(self.by_file.get(path, ()))
+        if path not in self.watcher.files() and os.path.exists(path):
+            self.watcher.addPath(path)
+
+    def _on_dir(self, path):
+        self._mark(self.by_dir.get(path, ()))
+        watched = set(self.watcher.files())
+        for f, entries in self.by_file.items():
+            # 지워졌다가 다시 생긴 파일 → 감시를 다시 걸고 바뀐 것으로 본다
+            if f not in watched and os.path.dirname(f) == path and os.path.exists(f):
+                self.watcher.addPath(f)
+                self._mark(entries)
+
+    def _flush(self):
+        pending, self.pending = self.pending, {}
+        for (_name, key), char in pending.items():
+            t0 = time.perf_counter()
+            if char.reload(key) is None:
+                continue
+            n = 0
+            for pet in self.mgr.pets:
+                if pet.char is char and pet.reload_action(key):
+                    n += 1
+            if sys.stderr:
+                print(f"reload {char.name}/{key}: {(time.perf_counter() - t0) * 1000:.0f} ms,"
+                      f" {n} pets", file=sys.stderr)
+
+
 class PetManager(QtCore.QObject):
     MAX_PETS = 16
 
-    def __init__(self, app):
+    def __init__(self, app, link=None):
         super().__init__()
         self.app = app
+        self.link = link            # 샤드 워커일 때 조정자와의 연결 (ShardLink)
+        self.control = None         # PET_CONTROL 로 연 ControlServer
         self.pets = []
-        self.game_lock = False
+        self.next_pid = 0
+        self._game_lock = False
+        self.chars = CharacterRegistry(ASSETS_DIR, find_archive())
         self.overlay = FullScreenOverlay()
         self.overlay.hide()
+        self.frame_stats = FrameStats(self)
+        self.quality = QualityGovernor(self)
+        self.screens = ScreenIndex(app)
+        self.screens.changed.connect(self._on_screens_changed)
+        self._make_menu()
+        self.app.aboutToQuit.connect(self._on_quit)
+
+        self.persist = True     # False 면 세션 스냅샷을 저장/삭제하지 않는다 (기록 중)
+        self.snapshot_timer = session.Timer(self)
+        self.snapshot_timer.setInterval(SNAPSHOT_INTERVAL_MS)
+        self.snapshot_timer.timeout.connect(self.save_snapshot)
+        self.snapshot_timer.start()
+
+        self.visibility_timer = session.Timer(self)
+        self.visibility_timer.setInterval(VISIBILITY_MS)
+        self.visibility_timer.timeout.connect(self._update_visibility)
+        self.visibility_timer.start()
+
+        self.asset_watcher = AssetWatcher(self) if DEV_RELOAD else None
+
+    @property
+    def game_lock(self):
+        return self._game_lock
+
+    @game_lock.setter
+    def game_lock(self, on):
+        # 미니게임은 전체에서 한 펫만 — 샤드 워커면 조정자를 통해 다른 워커에도 알린다
+        if on != self._game_lock and self.link is not None:
+            self.link.send("game_lock", on)
+        self._game_lock = on
+
+    def request_spawn(self, pos=None, char=None):
+        if self.link is not None:
+            # 어느 워커에 띄울지는 조정자가 정한다
+            self.link.send("spawn_req", (char or self.chars.default).name,
+                           None if pos is None else (pos.x(), pos.y()))
+            return None
+        return self.spawn(pos, char=char)
 
-    def spawn(self, pos=None):
+    def spawn(self, pos=None, initial_action=None, char=None, pid=None):
         if self.game_lock:
             return None
         if len(self.pets) >= self.MAX_PETS:
             return None
-        pet = Pet(self)
+        if pid is None:
+            pid = self.next_pid
+            self.next_pid += 1
+        pet = Pet(self, pid, initial_action, char or self.chars.default)
         self.pets.append(pet)
+        pet._apply_quality()
         if pos is not None:
             pet.move(pos)
         pet._snap_floor_force()
+        pet._commit_geometry()
         pet.show()
         return pet
 
@@ -188,17 +1393,215 @@ class PetManager(QtCore.QObject):
             self.pets.remove(pet)
         except ValueError:
             pass
-        pet.close()
+        self.frame_stats.forget(pet)
+        pet.shutdown()
+        self._update_visibility()
+        if self.link is not None:
+            self.link.send("removed", pet.pid)     # 전체 펫 수와 종료는 조정자가 판단
+            return
         if not self.pets:
+            # 펫을 전부 닫은 건 사용자 의도이므로 다음 실행은 처음부터
+            self._delete_snapshot()
             QtCore.QTimer.singleShot(0, self.app.quit)
 
+    # ===== 세션 스냅샷 =====
+    def _snapshot_path(self) -> Path:
+        if SNAPSHOT_PATH:
+            return Path(SNAPSHOT_PATH)
+        base = QtCore.QStandardPaths.writableLocation(QtCore.QStandardPaths.GenericConfigLocation)
+        return Path(base or Path.home()) / "YujeongPet" / "session.json"
+
+    def save_snapshot(self):
+        if not self.pets or self.link is not None or not self.persist:
+            return
+        data = {"version": 1,
+                "pets": [pet.snapshot_state() for pet in self.pets]}
+        path = self._snapshot_path()
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+            tmp.replace(path)
+        except OSError:
+            pass
+
+    def _delete_snapshot(self):
+        if not self.persist:
+            return
+        try:
+            self._snapshot_path().unlink()
+        except OSError:
+            pass
+
+    def restore_snapshot(self) -> bool:
+        try:
+            data = json.loads(self._snapshot_path().read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return False
+        if data.get("version") != 1:
+            return False
+        restored = 0
+        for st in data.get("pets", [])[:self.MAX_PETS]:
+            char = self.chars.get(st.get("char", data.get("char", CHAR_NAME)))
+            if char is None:
+                continue    # 그 사이 에셋 폴더가 빠진 캐릭터
+            # 지금 보여줄 액션만 먼저 로드하고 나머지는 펫이 뒤에서 하나씩 불러온다
+            action = st.get("action") if st.get("action") in char.actions else "idle"
+            pet = self.spawn(QtCore.QPoint(int(st.get("x", 0)), int(st.get("y", 0))),
+                             initial_action=action, char=char)
+            if pet is None:
+                break
+            pet.restore_state(st)
+            pet._commit_geometry()
+            restored += 1
+        return restored > 0
+
+    # ===== 화면 밖 펫 =====
+    def _update_visibility(self):
+        # 화면 밖으로 완전히 나간 펫은 프레임을 그리지 않는다.
+        # (다른 펫에 가려진 경우는 보지 않는다 — 실제 창 쌓임 순서와 불투명 영역을 알 수 없다)
+        for pet in self.pets:
+            visible = (pet.state in GAME_STATES or pet.giant_animating or pet.dragging
+                       or self.screens.on_screen(pet.geometry()))
+            pet._set_render_visible(visible)
+
+    def _on_screens_changed(self):
+        # 화면이 빠지면 OS 가 창을 옮기므로 논리 위치를 실제 위치로 다시 맞춘다
+        for pet in self.pets:
+            pet._sync_geometry()
+
+    # ===== 공용 메뉴 =====
+    def _make_menu(self):
+        # 모든 펫이 메뉴 하나를 같이 쓴다. 체크 상태는 열 때 대상 펫에서 채운다.
+        # 각 QAction 의 data() 에 메뉴 키를 넣어 두고 Pet._on_menu_action(키) 로 처리한다
+        self.menu = QtWidgets.QMenu()
+        def add(menu, text, key, checkable=False):
+            act = menu.addAction(text)
+            act.setData(key)
+            act.setCheckable(checkable)
+            return act
+
+        self.act_follow = add(self.menu, "마우스 따라가기", "follow", True)
+        self.act_random = add(self.menu, "랜덤 이동", "random", True)
+        self.menu.addSeparator()
+        self.act_dance  = add(self.menu, "춤추기 (토글)", "dance", True)
+        add(self.menu, "간식주기 (6초)", "eat")
+        add(self.menu, "쓰다듬기 (6초)", "pet")
+        self.act_ex     = add(self.menu, "운동하기 (토글)", "exercise", True)
+        self.act_sleep  = add(self.menu, "잠자기 (토글)", "sleep", True)
+        self.act_clean  = add(self.menu, "청소하기 (토글)", "clean", True)
+
+        # ✅ 미니게임 메뉴
+        self.menu.addSeparator()
+        self.game_menu  = self.menu.addMenu("미니게임")
+        add(self.game_menu, "간식먹기", "game_snack")
+        add(self.game_menu, "장애물 피하기", "game_obstacle")
+        add(self.game_menu, "헤딩하기", "game_heading")
+        if np is not None:
+            add(self.game_menu, "헤딩하기 (여러 공)", "game_multiball")
+
+        self.menu.addSeparator()
+        self.size_menu  = self.menu.addMenu("크기")
+        self.size_actions = []
+        for i, (name, sc) in enumerate(SCALE_PRESETS):
+            self.size_actions.append(add(self.size_menu, name, f"size:{i}", True))
+        self.menu.addSeparator()
+        self.act_giant  = add(self.menu, "거인화 (토글)", "giant", True)
+        self.act_multi  = add(self.menu, "멀티 모니터 (토글)", "multi", True)
+        add(self.menu, "프레임 통계", "stats")
+        if tracer is not None:
+            add(self.menu, "트레이스 저장", "trace")
+        self.menu.addSeparator()
+        names = self.chars.names()
+        if len(names) > 1:
+            spawn_menu = self.menu.addMenu("펫 추가")
+            for name in names:
+                add(spawn_menu, name, f"spawn:{name}")
+        else:
+            add(self.menu, "펫 추가", "spawn")
+        add(self.menu, "이 펫 닫기", "close")
+
+    def _refresh_menu_checks(self, pet):
+        self.act_follow.setChecked(pet.follow_mouse)
+        self.act_random.setChecked(pet.random_walk)
+        self.act_dance.setChecked(pet.state is PetState.DANCE)
+        self.act_ex.setChecked(pet.state is PetState.EXERCISE)
+        self.act_sleep.setChecked(pet.state is PetState.SLEEP)
+        self.act_clean.setChecked(pet.state is PetState.CLEANING)
+        self.act_giant.setChecked(pet.is_giant)
+        self.act_multi.setChecked(pet.use_virtual_desktop)
+        for act, (_, sc) in zip(self.size_actions, SCALE_PRESETS):
+            act.setChecked(abs(pet.scale_base - sc) < 1e-6)
+
+    def exec_menu(self, pet, global_pos: QtCore.QPoint):
+        self._refresh_menu_checks(pet)
+        action = self.menu.exec_(global_pos)
+        if action is None:
+            return None
+        return action.data()
+
+    def show_frame_stats(self):
+        box = QtWidgets.QMessageBox(QtWidgets.QMessageBox.Information, "프레임 통계",
+                                    self.frame_stats.summary() + "\n\n" + self.chars.summary())
+        box.setStyleSheet("QLabel { font-family: monospace; }")
+        box.exec_()
+
+    def dump_trace(self, path: str = None):
+        if tracer is None:
+            return None
+        return tracer.dump(path)
+
+    def _on_quit(self):
+        self.save_snapshot()
+        try:
+            self.dump_trace()
+        except OSError as e:
+            # 트레이스를 못 써도 통계 출력과 세션 정리는 계속한다
+            if sys.stderr:
+                print(f"트레이스 저장 실패: {e}", file=sys.stderr)
+        if FRAME_STATS_REPORT and sys.stderr:
+            print(self.frame_stats.summary(), file=sys.stderr)
+        session.close()
+
+
+# ==========================
+# 시뮬레이션 코어 연결 — 물리/이동 상태는 Qt 없는 petsim.Body 에 있다
+# ==========================
+def _body_field(name):
+    # Pet 의 같은 이름 속성을 self.body 로 위임
+    return property(lambda self: getattr(self.body, name),
+                    lambda self, v: setattr(self.body, name, v))
+
 
 class Pet(QtWidgets.QMainWindow):
-    def __init__(self, manager: PetManager):
+    # ===== 시뮬레이션 상태 (self.body) =====
+    vx                     = _body_field("vx")
+    vy                     = _body_field("vy")
+    bounce_count           = _body_field("bounce_count")
+    manual_drop            = _body_field("manual_drop")
+    free_bounce            = _body_field("free_bounce")
+    dragging               = _body_field("dragging")
+    follow_mouse           = _body_field("follow_mouse")
+    random_walk            = _body_field("random_walk")
+    is_giant               = _body_field("is_giant")
+    active_temp_action     = _body_field("active_temp_action")
+    force_action_until     = _body_field("force_action_until")
+    rw_vx                  = _body_field("rw_vx")
+    clean_vx               = _body_field("clean_vx")
+    is_climbing            = _body_field("is_climbing")
+    climb_side             = _body_field("climb_side")
+    climb_locked_from_drag = _body_field("climb_locked_from_drag")
+    climb_lock_expire      = _body_field("climb_lock_expire")
+
+    def __init__(self, manager: PetManager, pid: int = 0, initial_action=None, char: Character = None):
         super().__init__()
+        # 물리/이동 상태는 Qt 없는 petsim.Body 에 있다 (위의 _body_field 속성으로 위임)
+        self.body = petsim.Body()
         self.mgr = manager
+        self.pid = pid
+        self.char = char or manager.chars.default
 
-        self.setWindowTitle(CHAR_NAME)
+        self.setWindowTitle(self.char.name)
         self.setAttribute(QtCore.Qt.WA_TranslucentBackground, True)
         self.setAttribute(QtCore.Qt.WA_NoSystemBackground, True)
         self.setWindowFlag(QtCore.Qt.FramelessWindowHint, True)
@@ -211,11 +1614,23 @@ class Pet(QtWidgets.QMainWindow):
         if os.path.exists(icon_path):
             self.setWindowIcon(QtGui.QIcon(icon_path))
 
-        self.label = QtWidgets.QLabel(self)
+        self.label = PetLabel(self)
         self.label.setAttribute(QtCore.Qt.WA_TranslucentBackground, True)
         self.label.setContentsMargins(0,0,0,0)
         self.setCentralWidget(self.label)
 
+        # tick 동안 바뀐 위치/크기/프레임은 여기 모아 두었다가 _commit_geometry 에서 한 번에 반영
+        self._geo = QtCore.QRect(super().geometry())
+        self._geo_dirty = False
+        self._pending_pix = None
+        self._pending_mask = None
+        self._applied_mask = None
+        # 투명한 곳 클릭은 바탕화면으로 넘긴다 (크로마키 모드는 setMask 가 대신함)
+        self._shown_pix = None
+        self._hit_masks = {}        # pix.cacheKey() → HitMask
+        self._pass_through = False
+        self.render_visible = True  # False 면 애니메이션 시계만 흐르고 프레임은 안 그린다
+
         self.use_virtual_desktop = False
 
         self.scale_base = 0.65
@@ -240,24 +1655,38 @@ class Pet(QtWidgets.QMainWindow):
         self.climb_locked_from_drag = False
         self.climb_lock_expire = 0.0
 
-        self.clean_timer   = QtCore.QTimer(self)
+        self.clean_timer   = session.Timer(self)
         self.clean_timer.setInterval(6000)
         self.clean_timer.timeout.connect(self._cleaning_step)
         self.clean_vx      = 0
 
-        self.game_timer = QtCore.QTimer(self)
+        self.game_timer = session.Timer(self)
         self.game_timer.setInterval(GAME_TICK_MS)
         self.game_timer.timeout.connect(self._game_tick)
         self.game_paused = False
         self.game_widgets = []
 
-        self._predecode_all()
+        self._plain_variants = {}   # smooth 로 바꾼 액션의 원래 (raw, scaled)
+        self._smooth_tried   = set()
+        self.smooth_timer = session.Timer(self)
+        self.smooth_timer.setInterval(SMOOTH_LOAD_MS)
+        self.smooth_timer.timeout.connect(self._load_smooth_step)
+
+        self.load_timer = session.Timer(self)
+        self.load_timer.setInterval(DEFERRED_LOAD_MS)
+        self.load_timer.timeout.connect(self._load_deferred_step)
+
+        if initial_action:
+            # 스냅샷 복원: 보여줄 액션만 먼저, 나머지는 load_timer 로
+            self._load_action(initial_action)
+        else:
+            self._predecode_all()
         self._rebuild_scaled_cache()
 
         self.current_action    = None
         self.current_frame_idx = 0
-        self.next_frame_time   = time.monotonic()
-        self._sync_frames_left = INITIAL_SYNC_FRAMES
+        self.anim_start        = session.now()
+        self.next_frame_time   = self.anim_start
         self.current_pix_w     = 64
         self.current_pix_h     = 64
         self.current_floor_h   = self.global_max_h
@@ -276,7 +1705,9 @@ class Pet(QtWidgets.QMainWindow):
 
         self.follow_mouse  = False
         self.random_walk   = False
-        self.mode          = "normal"
+        self.state         = PetState.NORMAL
+        self._tick_state   = self._tick_normal
+        self._game_tick_state = None
         self.menu_open     = False
 
         self.active_temp_action = None
@@ -288,15 +1719,30 @@ class Pet(QtWidgets.QMainWindow):
 
         self.exercise_cycle = ["squat","boxing","plank","jumping_jacks"]
         self.exercise_idx   = 0
-        self.exercise_timer = QtCore.QTimer(self)
+        self.exercise_timer = session.Timer(self)
         self.exercise_timer.timeout.connect(self._exercise_next)
 
-        self.single_click_timer = QtCore.QTimer(self)
+        # 다음에 올 액션 후보 (앞쪽이 급한 것). load_timer 가 미뤄 둔 액션보다 먼저 처리한다
+        self._prefetch = deque()
+        self._next_top = None
+        self._next_hints = dict(ACTION_NEXT_HINTS)
+        cycle = self.exercise_cycle
+        for a, b in zip(cycle, cycle[1:] + cycle[:1]):
+            self._next_hints[a] = (b,) + self._next_hints.get(a, ())
+
+        self.temp_timer = session.Timer(self)
+        self.temp_timer.setSingleShot(True)
+        self.temp_timer.timeout.connect(self._on_temp_timer)
+        self._temp_end = None
+        self.snack_grow_timer = None
+
+        self.single_click_timer = session.Timer(self)
         self.single_click_timer.setSingleShot(True)
         self.single_click_timer.timeout.connect(self._trigger_single_click)
 
-        self._make_menu()
-        self.set_action("idle", force=True, suppress_bounce=True)
+        self.set_action(initial_action or "idle", force=True, suppress_bounce=True)
+        if len(self.raw_animations) < len(self.char.actions):
+            self.load_timer.start()
 
         desk = self._desktop_rect()
         sx = desk.x() + max(40, desk.width()//2 - self.width()//2)
@@ -304,105 +1750,353 @@ class Pet(QtWidgets.QMainWindow):
         self.move(sx, sy)
         self._snap_floor_force()
 
-        self.tick = QtCore.QTimer(self)
+        self.tick = session.Timer(self)
         self.tick.timeout.connect(self.update_loop)
-        self.tick.start(16)
+        self.tick.start(petsim.TICK_MS)     # petsim 의 step_* 는 고정 tick 기준
+
+    # ===== 지오메트리 커밋 =====
+    def move(self, *args):
+        p = QtCore.QPoint(*args) if len(args) == 2 else QtCore.QPoint(args[0])
+        if p != self._geo.topLeft():
+            self._geo.moveTopLeft(p)
+            self._geo_dirty = True
+
+    def setFixedSize(self, *args):
+        size = QtCore.QSize(*args) if len(args) == 2 else QtCore.QSize(args[0])
+        if size != self._geo.size():
+            self._geo.setSize(size)
+            self._geo_dirty = True
+
+    def x(self):
+        return self._geo.x()
+
+    def y(self):
+        return self._geo.y()
+
+    def pos(self):
+        return self._geo.topLeft()
+
+    def width(self):
+        return self._geo.width()
+
+    def height(self):
+        return self._geo.height()
+
+    def geometry(self):
+        return QtCore.QRect(self._geo)
+
+    def _sync_geometry(self):
+        if not self._geo_dirty:
+            self._geo = QtCore.QRect(super().geometry())
+
+    def _present(self, pix: QtGui.QPixmap, mask: QtGui.QRegion = None):
+        dpr = pix.devicePixelRatio() or 1.0
+        self.current_pix_w = int(pix.width()/dpr)
+        self.current_pix_h = int(pix.height()/dpr)
+        self._pending_pix = pix
+        self._pending_mask = mask
+        self.setFixedSize(self.current_pix_w+WINDOW_PAD, self.current_pix_h+WINDOW_PAD)
+
+    def _commit_geometry(self):
+        pix = self._pending_pix
+        if pix is not None:
+            self._pending_pix = None
+            self._shown_pix = pix
+            self.label.setPixmap(pix)
+            self.label.resize(self.current_pix_w, self.current_pix_h)
+            if BG_MODE == "chroma":
+                mask = self._pending_mask
+                if mask is None:
+                    mask = chroma_mask(pix)    # 거인화 애니메이션처럼 캐시에 없는 프레임
+                if mask is not self._applied_mask:
+                    self.setMask(mask)
+                    self._applied_mask = mask
+            self._pending_mask = None
+        if not self._geo_dirty:
+            return
+        self._geo_dirty = False
+        g = self._geo
+        if g.size() != super().size():
+            # 고정 크기 제약을 잠깐 풀어야 setGeometry 한 번으로 위치와 크기가 같이 바뀐다
+            super().setMinimumSize(0, 0)
+            super().setMaximumSize(QWIDGETSIZE_MAX, QWIDGETSIZE_MAX)
+            super().setGeometry(g)
+            super().setFixedSize(g.size())
+        elif g.topLeft() != super().pos():
+            super().move(g.topLeft())
+
+    # ===== 정리 =====
+    def shutdown(self):
+        # 매니저에서 빠진 펫: 타이머를 세우고 게임 위젯과 창을 Qt 쪽에서도 지운다
+        if self.state in GAME_STATES:
+            self._exit_game_mode()
+        for t in self.findChildren(session.Timer):
+            t.stop()
+        self.close()
+        self.deleteLater()
+
+    # ===== 클릭 판정 =====
+    def _hit_at(self, p: QtCore.QPoint) -> bool:
+        pix = self._shown_pix
+        if BG_MODE == "chroma" or pix is None or self.giant_animating:
+            return True
+        m = self._hit_masks.get(pix.cacheKey())
+        if m is None:
+            if len(self._hit_masks) > 512:
+                self._hit_masks = {}
+            m = self._hit_masks[pix.cacheKey()] = HitMask(pix)
+        dpr = pix.devicePixelRatio() or 1.0
+        return m.hit(int(p.x() * dpr), int(p.y() * dpr))
+
+    def _set_pass_through(self, on: bool):
+        if on == self._pass_through:
+            return
+        self._pass_through = on
+        win = self.windowHandle()
+        if win is not None:
+            win.setFlag(QtCore.Qt.WindowTransparentForInput, on)
+
+    def _poll_pass_through(self):
+        # 통과 중에는 마우스 이벤트가 오지 않으므로 커서가 캐릭터 위로 돌아왔는지 tick 마다 본다.
+        # 창 플래그만 바꾸고 펫 상태는 건드리지 않으니 기록/재생용 session 커서는 쓰지 않는다
+        gp = QtGui.QCursor.pos()
+        if self._geo.contains(gp) and not self._hit_at(gp - self.pos()):
+            return
+        self._set_pass_through(False)
 
     # ===== 화면 =====
     def _desktop_rect(self):
         if self.use_virtual_desktop:
-            return desktop_virtual_rect()
-        scr = QtGui.QGuiApplication.screenAt(self.pos())
-        if scr:
-            return scr.availableGeometry()
-        scr = QtWidgets.QApplication.primaryScreen()
-        return scr.availableGeometry() if scr else QtCore.QRect(0,0,1920,1080)
+            # 크기가 다른 모니터가 섞여 있어도 실제 바닥/벽을 따르도록 펫 중심 x 기준 영역
+            return self.mgr.screens.span_rect_at(self._geo.x() + self._geo.width()//2)
+        return self.mgr.screens.screen_rect_at(self.pos())
 
     # ===== 디코딩 =====
     def _predecode_all(self):
-        base = BASE_DIR / "assets" / CHAR_NAME
-        for action, rel in ACTIONS.items():
-            gif_path = base / rel
-            if gif_path.exists():
-                frames, delays, mw, mh = self._decode_gif(str(gif_path))
-            else:
-                png_dir = gif_path.parent
-                frames, delays, mw, mh = self._decode_png_folder(png_dir)
-            self.raw_animations[action] = list(zip(frames, delays))
-            self.anim_max_size[action]  = (mw, mh)
-            if delays:
-                avg = sum(delays)/len(delays)
-            else:
-                avg = 0.05
-            if avg <= 0: avg = 0.05
-            self.anim_meta[action] = {"avg_delay": avg, "orig_fps": 1.0/avg}
+        self.char.preload()
+        for action in self.char.actions:
+            self._load_action(action)
         self.global_max_h = max((mh for (_, (mw, mh)) in self.anim_max_size.items()), default=64)
 
+    def _load_raw(self, key, gif_path: Path):
+        # 디코딩 결과는 캐릭터에 두고 같은 캐릭터의 모든 펫이 같이 쓴다
+        return self.char.load(key, gif_path)
+
+    def _load_action(self, action) -> bool:
+        if action in self.raw_animations:
+            return True
+        path = self.char.source(action)
+        if path is None:
+            return False
+        raw, (mw, mh) = self._load_raw(action, path)
+        self.raw_animations[action] = raw
+        self.anim_max_size[action]  = (mw, mh)
+        self.anim_meta[action] = frame_timeline(raw)
+        return True
+
+    def _ensure_action(self, action) -> bool:
+        # 아직 로드 전인 액션을 지금 바로 쓰려는 경우 (스냅샷 복원 직후)
+        if action in self.animations:
+            return True
+        if not self._load_action(action):
+            return False
+        self._add_scaled(action)
+        return True
+
+    def _add_scaled(self, action):
+        if not isinstance(self.animations, LazyScaledCache):
+            self.animations[action] = self._scale_frames(self.raw_animations[action])
+        self._add_scaled_size(action)
+
+    def _add_scaled_size(self, action):
+        max_w_raw, max_h_raw = self.anim_max_size.get(action, (64,64))
+        max_w_s = max(1, int(max_w_raw * self.scale))
+        max_h_s = max(1, int(max_h_raw * self.scale))
+        self.scaled_max_size[action] = (max_w_s, max_h_s)
+        self.global_max_h = max(self.global_max_h, max_h_s)
+
+    def _load_deferred_step(self):
+        # 한 번에 액션 하나씩 — 미리 읽기 후보가 먼저, 그다음 아직 안 읽은 나머지.
+        # GUI 스레드에서 도는 일이라 메뉴가 떠 있거나 품질 조정기가 압박을 보면 이번 차례는 쉰다
+        if self.menu_open or self.mgr.quality.busy:
+            return
+        while self._prefetch:
+            if self._prefetch_one(self._prefetch.popleft()):
+                return
+        for action in self.char.actions:
+            if action not in self.raw_animations:
+                self._ensure_action(action)
+                return
+        self.load_timer.stop()
+
+    # ===== 다음 액션 미리 읽기 =====
+    def prefetch(self, actions):
+        todo = [a for a in actions if a in self.char.actions
+                and (a not in self.raw_animations or a == self._next_top)]
+        if not todo:
+            return
+        for a in reversed(todo):
+            self._prefetch.appendleft(a)
+        while len(self._prefetch) > PREFETCH_QUEUE:
+            self._prefetch.pop()
+        if not self.load_timer.isActive():
+            self.load_timer.start()
+
+    def _prefetch_next(self, action):
+        cands = [a for a in list(self._next_hints.get(action, ()))
+                 + self.char.likely_next(action, PREFETCH_TOP) if a in self.char.actions]
+        self._next_top = cands[0] if cands else None
+        self.prefetch(cands)
+
+    def _prefetch_one(self, action) -> bool:
+        # 할 일이 있었으면 True. 디코딩은 캐릭터가 공유하고 스케일은 이 펫 배율로.
+        # indexed 저장이면 펼친 프레임은 가장 유력한 후보 하나만 미리 만들어 둔다
+        did = False
+        if action not in self.raw_animations:
+            if not self._ensure_action(action):
+                return False
+            did = True
+        if (action == self._next_top and isinstance(self.animations, LazyScaledCache)
+                and self.animations.peek(action) is None):
+            self.animations[action]    # 만들어서 캐시에 넣어 둔다
+            did = True
+        return did
+
     def _rebuild_scaled_cache(self):
-        self.animations = {}
+        if FRAME_STORAGE == "indexed":
+            # 팔레트 원본은 그대로 두고, 펼친 프레임은 지금 액션과 다음 후보 하나 것만 만든다
+            self.animations = LazyScaledCache(self.raw_animations, self._scale_frames,
+                                              PREFETCH_SCALED)
+        else:
+            self.animations = {}
         self.scaled_max_size = {}
-        max_h_all = 1
-        for action, raw_list in self.raw_animations.items():
-            scaled_list = []
-            max_w_raw, max_h_raw = self.anim_max_size.get(action, (64,64))
-            max_w_s = max(1, int(max_w_raw * self.scale))
-            max_h_s = max(1, int(max_h_raw * self.scale))
-            for (pm, delay) in raw_list:
-                if pm.isNull():
-                    spm = QtGui.QPixmap(32,32); spm.fill(QtCore.Qt.transparent)
-                else:
-                    sw = max(1, int(pm.width()  * self.scale))
-                    sh = max(1, int(pm.height() * self.scale))
-                    spm = pm.scaled(sw, sh, QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation)
-                scaled_list.append((spm, delay))
-            self.animations[action] = scaled_list
-            self.scaled_max_size[action] = (max_w_s, max_h_s)
-            max_h_all = max(max_h_all, max_h_s)
-        self.global_max_h = max_h_all
-
-    def _decode_gif(self, path):
-        movie = QtGui.QMovie(path)
-        frames = []
-        delays = []
-        max_w = 1; max_h = 1
-        idx = 0
-        while True:
-            if not movie.jumpToFrame(idx):
-                break
-            pix = movie.currentPixmap()
-            if pix.isNull():
-                break
-            w, h = pix.width(), pix.height()
-            max_w = max(max_w, w); max_h = max(max_h, h)
-            frames.append(pix)
-            d = movie.nextFrameDelay()
-            if d <= 0: d = MIN_FRAME_DELAY
-            delays.append(d/1000.0)
-            idx += 1
-        if not frames:
-            pm = QtGui.QPixmap(64,64); pm.fill(QtCore.Qt.transparent)
-            return [pm], [0.05], 64, 64
-        return frames, delays, max_w, max_h
-
-    def _decode_png_folder(self, folder: Path):
-        if not folder.exists():
-            pm = QtGui.QPixmap(64,64); pm.fill(QtCore.Qt.transparent)
-            return [pm], [0.05], 64, 64
-        files = sorted([p for p in folder.iterdir()
-                        if p.suffix.lower() in (".png",".webp",".jpg",".jpeg")],
-                       key=lambda p: p.name)
-        if not files:
-            pm = QtGui.QPixmap(64,64); pm.fill(QtCore.Qt.transparent)
-            return [pm], [0.05], 64, 64
-        frames, delays = [], []
-        max_w = 1; max_h = 1
-        for p in files:
-            pm = QtGui.QPixmap(p.as_posix())
-            if pm.isNull(): continue
-            w, h = pm.width(), pm.height()
-            max_w = max(max_w, w); max_h = max(max_h, h)
-            frames.append(pm); delays.append(0.05)
-        return frames, delays, max_w, max_h
+        self._hit_masks = {}
+        self._scaled_transform = self.mgr.quality.transform
+        self.global_max_h = 1
+        for action in self.raw_animations:
+            self._add_scaled(action)
+        # 보관 중인 plain 변형의 스케일본은 낡았으니 복원할 때 다시 만든다
+        for action, (raw_list, _) in self._plain_variants.items():
+            self._plain_variants[action] = (raw_list, None)
+
+    def _scale_frames(self, raw_list):
+        transform = self.mgr.quality.transform
+        scaled_list = []
+        for (pm, delay) in raw_list:
+            if pm.isNull():
+                spm = QtGui.QPixmap(32,32); spm.fill(QtCore.Qt.transparent)
+            else:
+                sw = max(1, int(pm.width()  * self.scale))
+                sh = max(1, int(pm.height() * self.scale))
+                spm = pm.scaled(sw, sh, QtCore.Qt.KeepAspectRatio, transform)
+                if isinstance(spm, QtGui.QImage):
+                    spm = QtGui.QPixmap.fromImage(spm)
+            # 크로마키 마스크는 스케일할 때 한 번만 만들어 프레임과 같이 둔다
+            mask = chroma_mask(spm) if BG_MODE == "chroma" else None
+            scaled_list.append((spm, delay, mask))
+        return scaled_list
+
+    # ===== 품질 단계 =====
+    def _apply_quality(self):
+        if self.mgr.quality.variant == "smooth":
+            if not self.smooth_timer.isActive():
+                self.smooth_timer.start()
+        else:
+            self.smooth_timer.stop()
+            self._drop_smooth()
+        if self.mgr.quality.transform != self._scaled_transform:
+            # 스케일 방식이 바뀌면 이미 만든 스케일본도 그 방식으로 다시 만든다
+            self._rebuild_scaled_cache()
+            if self.current_action and not self.giant_animating:
+                self._apply_current_frame()
+
+    def snapshot_state(self) -> dict:
+        mode = self.mode if self.state in POSED_STATES else "normal"
+        return {"x": self.x(), "y": self.y(), "scale_base": self.scale_base,
+                "giant": self.is_giant, "mode": mode, "action": self.current_action,
+                "follow": self.follow_mouse, "random": self.random_walk,
+                "multi": self.use_virtual_desktop, "char": self.char.name}
+
+    def restore_state(self, st: dict):
+        self.use_virtual_desktop = bool(st.get("multi", False))
+        self.scale_base = float(st.get("scale_base", self.scale_base))
+        self.is_giant = bool(st.get("giant", False))
+        target = self.scale_base * (GIANT_SCALE_FACTOR if self.is_giant else 1.0)
+        if abs(target - self.scale) > 1e-6:
+            self._set_scale(target)
+        menu_key = {"dance": "dance", "sleep": "sleep",
+                    "exercise": "exercise", "cleaning": "clean"}.get(st.get("mode"))
+        if menu_key:
+            self._on_menu_action(menu_key)
+        else:
+            self.follow_mouse = bool(st.get("follow", False))
+            self.random_walk = bool(st.get("random", False)) and not self.follow_mouse
+        self.move(int(st.get("x", self.x())), int(st.get("y", self.y())))
+        self._snap_floor_force()
+
+    def _load_smooth_step(self):
+        # 여유가 있을 때만 불리므로 한 번에 액션 하나씩만 디코딩
+        base = self.char.base
+        pack = self.char.pack
+        for action, rel in self.char.actions.items():
+            if action in self._smooth_tried or action not in self.raw_animations:
+                continue
+            self._smooth_tried.add(action)
+            path = base / smooth_variant(rel)
+            if not path.exists() and not (pack and action + SMOOTH_SUFFIX in pack.actions):
+                continue
+            raw, _size = self._load_raw(action + SMOOTH_SUFFIX, path)
+            self._plain_variants[action] = (self.raw_animations[action], self._cached_scaled(action))
+            self._swap_variant(action, raw)
+            return
+        self.smooth_timer.stop()
+
+    def reload_action(self, key) -> bool:
+        # 캐릭터가 key 를 새로 디코딩했다 — 이 펫의 배율로 다시 스케일해서 바꿔 낀다
+        action = key[:-len(SMOOTH_SUFFIX)] if key.endswith(SMOOTH_SUFFIX) else key
+        if action not in self.raw_animations:
+            return False    # 아직 안 읽은 액션은 나중에 읽을 때 새 프레임을 받는다
+        raw, size = self.char.frames[key]
+        if action in self._plain_variants:
+            # smooth 변형을 보여 주는 중
+            if key == action:
+                self._plain_variants[action] = (raw, None)
+                self.anim_max_size[action] = size
+                return True
+        elif key != action:
+            return False
+        else:
+            self.anim_max_size[action] = size
+        self._hit_masks = {}
+        self._swap_variant(action, raw)
+        self._add_scaled_size(action)
+        if action == self.current_action:
+            self.current_floor_h = self.scaled_max_size[action][1]
+        return True
+
+    def _drop_smooth(self):
+        for action, (raw, scaled) in self._plain_variants.items():
+            self._swap_variant(action, raw, scaled)
+        self._plain_variants = {}
+        self._smooth_tried = set()
+
+    def _cached_scaled(self, action):
+        if isinstance(self.animations, LazyScaledCache):
+            return self.animations.peek(action)
+        return self.animations.get(action)
+
+    def _swap_variant(self, action, raw, scaled=None):
+        self.raw_animations[action] = raw
+        self.anim_meta[action] = frame_timeline(raw)
+        if isinstance(self.animations, LazyScaledCache):
+            self.animations.discard(action)
+        else:
+            self.animations[action] = scaled if scaled is not None else self._scale_frames(raw)
+        if action == self.current_action and raw:
+            # 변형끼리 프레임 수가 달라도 같은 경과 시간의 프레임으로 이어진다
+            self.current_frame_idx, self.next_frame_time = self._frame_at(session.now())
+            if not self.giant_animating:
+                self._apply_current_frame()
 
     # ===== 바닥 =====
     def _floor_y_window(self):
@@ -430,163 +2124,142 @@ class Pet(QtWidgets.QMainWindow):
         self.bounce_count = 0
 
     # ===== 메뉴 =====
-    def _make_menu(self):
-        self.menu = QtWidgets.QMenu(self)
-        self.act_follow = self.menu.addAction("마우스 따라가기")
-        self.act_random = self.menu.addAction("랜덤 이동")
-        self.menu.addSeparator()
-        self.act_dance  = self.menu.addAction("춤추기 (토글)")
-        self.act_eat    = self.menu.addAction("간식주기 (6초)")
-        self.act_pet    = self.menu.addAction("쓰다듬기 (6초)")
-        self.act_ex     = self.menu.addAction("운동하기 (토글)")
-        self.act_sleep  = self.menu.addAction("잠자기 (토글)")
-        self.act_clean  = self.menu.addAction("청소하기 (토글)")
-
-        # ✅ 미니게임 메뉴
-        self.menu.addSeparator()
-        self.game_menu  = self.menu.addMenu("미니게임")
-        self.act_game_snack    = self.game_menu.addAction("간식먹기")
-        self.act_game_obstacle = self.game_menu.addAction("장애물 피하기")
-        self.act_game_heading  = self.game_menu.addAction("헤딩하기")
-
-        self.menu.addSeparator()
-        self.size_menu  = self.menu.addMenu("크기")
-        self.size_actions = []
-        for name, sc in SCALE_PRESETS:
-            act = self.size_menu.addAction(name)
-            act.setCheckable(True)
-            act._scale_value = sc
-            self.size_actions.append(act)
-        self.menu.addSeparator()
-        self.act_giant  = self.menu.addAction("거인화 (토글)")
-        self.act_giant.setCheckable(True)
-        self.act_multi  = self.menu.addAction("멀티 모니터 (토글)")
-        self.menu.addSeparator()
-        self.act_spawn  = self.menu.addAction("펫 추가")
-        self.act_close  = self.menu.addAction("이 펫 닫기")
-
-        for a in [self.act_follow, self.act_random,
-                  self.act_dance, self.act_ex, self.act_sleep,
-                  self.act_clean]:
-            a.setCheckable(True)
-        self.act_multi.setCheckable(True)
-
     def contextMenuEvent(self, ev):
-        if self.mode and self.mode.startswith("game_"):
+        if self.state in GAME_STATES:
+            return
+        if not self._hit_at(ev.pos()):
+            ev.ignore()
             return
         self.menu_open = True
-        action = self.menu.exec_(self.mapToGlobal(ev.pos()))
+        key = self.mgr.exec_menu(self, self.mapToGlobal(ev.pos()))
         self.menu_open = False
+        if not key:
+            return
+        session.record("menu", pet=self.pid, key=key)
+        self._on_menu_action(key)
 
-        if action == self.act_follow:
+    def _on_menu_action(self, key: str):
+        if key == "follow":
             self.follow_mouse = not self.follow_mouse
             if self.follow_mouse:
                 self.random_walk = False
 
-        elif action == self.act_random:
+        elif key == "random":
             self.random_walk = not self.random_walk
             if self.random_walk:
                 self.follow_mouse = False
 
-        elif action == self.act_dance:
-            if self.mode == "dance":
-                self.mode = "normal"
+        elif key == "dance":
+            if self.state is PetState.DANCE:
+                self._set_state(PetState.NORMAL)
                 self.set_action("idle", force=True, suppress_bounce=True)
             else:
                 self._exit_modes()
-                self.mode = "dance"
+                self._set_state(PetState.DANCE)
                 self.set_action("dance", force=True, suppress_bounce=True)
 
-        elif action == self.act_ex:
-            if self.mode == "exercise":
-                self.mode = "normal"
+        elif key == "exercise":
+            if self.state is PetState.EXERCISE:
+                self._set_state(PetState.NORMAL)
                 self.exercise_timer.stop()
                 self.set_action("idle", force=True, suppress_bounce=True)
             else:
                 self._exit_modes()
-                self.mode = "exercise"
+                self._set_state(PetState.EXERCISE)
                 self.exercise_idx = 0
                 self.set_action(self.exercise_cycle[self.exercise_idx], force=True, suppress_bounce=True)
                 self.exercise_timer.start(10_000)
 
-        elif action == self.act_sleep:
-            if self.mode == "sleep":
-                self.mode = "normal"
+        elif key == "sleep":
+            if self.state is PetState.SLEEP:
+                self._set_state(PetState.NORMAL)
                 self.set_action("idle", force=True, suppress_bounce=True)
             else:
                 self._exit_modes()
-                self.mode = "sleep"
+                self._set_state(PetState.SLEEP)
                 self.set_action("sleep", force=True, suppress_bounce=True)
 
-        elif action == self.act_clean:
-            if self.mode == "cleaning":
+        elif key == "clean":
+            if self.state is PetState.CLEANING:
                 self._stop_cleaning_mode()
                 self.set_action("idle", force=True, suppress_bounce=True)
             else:
                 self._exit_modes()
                 self._start_cleaning_mode()
 
-        elif action == self.act_game_snack:
+        elif key == "game_snack":
             self._start_game_snack()
-        elif action == self.act_game_obstacle:
+        elif key == "game_obstacle":
             self._start_game_obstacle()
-        elif action == self.act_game_heading:
+        elif key == "game_heading":
             self._start_game_heading()
+        elif key == "game_multiball":
+            self._start_game_multiball()
 
-        elif action in self.size_actions:
-            for act in self.size_actions:
-                act.setChecked(False)
-            action.setChecked(True)
-            self.scale_base = action._scale_value
+        elif key.startswith("size:"):
+            idx = int(key.split(":", 1)[1])
+            self.scale_base = SCALE_PRESETS[idx][1]
             if not self.is_giant:
                 self._set_scale(self.scale_base)
             else:
                 self._set_scale(self.scale_base * GIANT_SCALE_FACTOR)
             self._snap_floor_force()
 
-        elif action == self.act_giant:
+        elif key == "giant":
             if self.is_giant:
                 self._start_giant_anim(self.scale_base, GIANT_ANIM_DUR)
             else:
                 self._start_giant_anim(self.scale_base * GIANT_SCALE_FACTOR, GIANT_ANIM_DUR)
 
-        elif action == self.act_multi:
+        elif key == "multi":
             self.use_virtual_desktop = not self.use_virtual_desktop
             self._snap_floor_force()
 
-        elif action == self.act_eat:
+        elif key == "stats":
+            self.mgr.show_frame_stats()
+
+        elif key == "trace":
+            try:
+                self.mgr.dump_trace()
+            except OSError as e:
+                QtWidgets.QMessageBox.warning(self, "트레이스 저장", f"저장 실패: {e}")
+
+        elif key == "eat":
             self._exit_modes()
             self._play_temp("eat", 6000)
 
-        elif action == self.act_pet:
+        elif key == "pet":
             self._exit_modes()
             self._play_temp("pet", 6000)
 
-        elif action == self.act_spawn:
+        elif key == "spawn" or key.startswith("spawn:"):
             g = self.geometry()
-            self.mgr.spawn(pos=QtCore.QPoint(g.x()+50, g.y()+20))
+            char = self.mgr.chars.get(key.split(":", 1)[1]) if ":" in key else self.char
+            self.mgr.request_spawn(QtCore.QPoint(g.x()+50, g.y()+20), char)
 
-        elif action == self.act_close:
+        elif key == "close":
             self.mgr.remove(self)
 
-        self._refresh_menu_checks()
-
-    def _refresh_menu_checks(self):
-        self.act_follow.setChecked(self.follow_mouse)
-        self.act_random.setChecked(self.random_walk)
-        self.act_dance.setChecked(self.mode == "dance")
-        self.act_ex.setChecked(self.mode == "exercise")
-        self.act_sleep.setChecked(self.mode == "sleep")
-        self.act_clean.setChecked(self.mode == "cleaning")
-        self.act_giant.setChecked(self.is_giant)
-        self.act_multi.setChecked(self.use_virtual_desktop)
-
     def _exit_modes(self):
-        if self.mode == "exercise":
+        if self.state is PetState.EXERCISE:
             self.exercise_timer.stop()
-        if self.mode == "cleaning":
+        if self.state is PetState.CLEANING:
             self._stop_cleaning_mode()
-        self.mode = "normal"
+        self._set_state(PetState.NORMAL)
+
+    # ===== 상태 전이 =====
+    @property
+    def mode(self) -> str:
+        return self.state.label
+
+    def _set_state(self, new: PetState):
+        if new not in STATE_TRANSITIONS[self.state]:
+            raise ValueError(f"잘못된 상태 전이: {self.state.name} -> {new.name}")
+        self.state = new
+        self._tick_state = getattr(self, STATE_TICK[new])
+        game_tick = STATE_GAME_TICK.get(new)
+        self._game_tick_state = getattr(self, game_tick) if game_tick else None
+        self.prefetch(STATE_PREFETCH.get(new, ()))
 
     # ===== 스케일/거인화 =====
     def _set_scale(self, new_scale: float):
@@ -607,24 +2280,23 @@ class Pet(QtWidgets.QMainWindow):
         self.giant_anim_pix = base_pix
         self.giant_anim_start = self.scale
         self.giant_anim_target = target
-        self.giant_anim_start_t = time.monotonic()
+        self.giant_anim_start_t = session.now()
         self.giant_anim_dur = dur
         self.giant_animating = True
         self.is_giant = target > self.scale_base + 1e-3
 
         if self.giant_anim_timer is None:
-            self.giant_anim_timer = QtCore.QTimer(self)
+            self.giant_anim_timer = session.Timer(self)
             self.giant_anim_timer.timeout.connect(self._giant_anim_step)
         self.giant_anim_timer.start(20)
 
     def _giant_anim_step(self):
-        now = time.monotonic()
+        now = session.now()
         t = (now - self.giant_anim_start_t) / self.giant_anim_dur
         if t >= 1.0:
             self.giant_animating = False
             self._set_scale(self.giant_anim_target)
             self._snap_floor_force()
-            self._refresh_menu_checks()
             if self.giant_anim_timer:
                 self.giant_anim_timer.stop()
             return
@@ -632,27 +2304,27 @@ class Pet(QtWidgets.QMainWindow):
         pm = self.giant_anim_pix
         sw = max(1, int(pm.width()  * (s / self.scale)))
         sh = max(1, int(pm.height() * (s / self.scale)))
-        spm = pm.scaled(sw, sh, QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation)
-        self.label.setPixmap(spm)
-        self.label.resize(spm.width(), spm.height())
-        self.setFixedSize(spm.width()+WINDOW_PAD, spm.height()+WINDOW_PAD)
+        spm = pm.scaled(sw, sh, QtCore.Qt.KeepAspectRatio, self.mgr.quality.transform)
+        self._present(spm)
         self._snap_floor_force()
 
     # ===== 액션 =====
     def set_action(self, key, force=False, suppress_bounce=True):
         if self.giant_animating and not force:
             return
-        if self.mode in ("dance","sleep","exercise","cleaning") and not force:
-            return
-        if self.mode and self.mode.startswith("game_") and not force:
+        if self.state is not PetState.NORMAL and not force:
             return
         if not force and key == self.current_action:
             return
-        if key not in self.animations:
+        if not self._ensure_action(key):
             return
 
+        self.char.note_transition(self.current_action, key)
         self.current_action = key
         self.current_frame_idx = 0
+        self.anim_start = session.now()
+        self.next_frame_time = self.anim_start + self.anim_meta[key][0][0]
+        self._prefetch_next(key)
 
         if key == "climb_left":
             self.is_climbing = True
@@ -670,7 +2342,8 @@ class Pet(QtWidgets.QMainWindow):
 
         frames = self.animations[key]
         if frames:
-            self._apply_frame(frames[0][0])
+            pix, _, mask = frames[0]
+            self._apply_frame(pix, mask)
 
         if suppress_bounce:
             self.vy = 0.0
@@ -681,38 +2354,50 @@ class Pet(QtWidgets.QMainWindow):
         if key not in FLOOR_SNAP_EXCLUDE and not self.free_bounce and not self.manual_drop:
             self._snap_floor()
 
-    def _apply_frame(self, pix: QtGui.QPixmap):
-        self.label.setPixmap(pix)
-        dpr = pix.devicePixelRatio() or 1.0
-        self.current_pix_w = int(pix.width()/dpr)
-        self.current_pix_h = int(pix.height()/dpr)
-        self.label.resize(self.current_pix_w, self.current_pix_h)
-        self.setFixedSize(self.current_pix_w+WINDOW_PAD, self.current_pix_h+WINDOW_PAD)
-        if BG_MODE == "chroma":
-            self.setMask(pix.createMaskFromColor(QtGui.QColor(255,255,255), QtCore.Qt.MaskOutColor))
-        else:
-            self.clearMask()
+    def _apply_frame(self, pix: QtGui.QPixmap, mask: QtGui.QRegion = None):
+        self._present(pix, mask)
 
     def _apply_current_frame(self):
         frames = self.animations.get(self.current_action)
         if not frames: return
-        self._apply_frame(frames[self.current_frame_idx][0])
+        pix, _, mask = frames[self.current_frame_idx]
+        self._apply_frame(pix, mask)
+
+    def _set_render_visible(self, visible: bool):
+        if visible == self.render_visible:
+            return
+        self.render_visible = visible
+        if visible and self.current_action:
+            # 안 보이던 동안 흐른 시간만큼 건너뛴 프레임에서 다시 시작
+            self.current_frame_idx, self.next_frame_time = self._frame_at(session.now())
+            if not self.giant_animating:
+                self._apply_current_frame()
 
     def _update_animation(self, now: float):
-        if self.giant_animating:
+        if self.giant_animating or not self.render_visible:
             return
         if not self.current_action: return
         frames = self.animations.get(self.current_action)
         if not frames: return
         if now < self.next_frame_time:
             return
-        meta = self.anim_meta.get(self.current_action, {"orig_fps": 20.0})
-        orig_fps = meta.get("orig_fps", 20.0)
-        step = max(1, round(orig_fps / DISPLAY_FPS))
-        self.current_frame_idx = (self.current_frame_idx + step) % len(frames)
-        pix, _ = frames[self.current_frame_idx]
-        self._apply_frame(pix)
-        self.next_frame_time = now + DISPLAY_DELAY
+        self.mgr.frame_stats.lateness(self, now - self.next_frame_time)
+        idx, next_change = self._frame_at(now)
+        # 표시 fps 보다 자주 바꾸지는 않는다. 오래 머무는 프레임은 바뀔 때까지 쉰다
+        self.next_frame_time = max(now + 1.0 / self.mgr.quality.display_fps, next_change)
+        if idx == self.current_frame_idx:
+            return
+        self.current_frame_idx = idx
+        pix, _, mask = frames[idx]
+        self._apply_frame(pix, mask)
+
+    def _frame_at(self, now: float):
+        # → (지금 보여야 할 프레임 번호, 그 프레임이 끝나는 시각)
+        ends, total = self.anim_meta[self.current_action]
+        elapsed = now - self.anim_start
+        cycle_start = now - (elapsed % total)
+        idx = min(bisect.bisect_right(ends, elapsed % total), len(ends) - 1)
+        return idx, cycle_start + ends[idx]
 
     def _play_temp(self, key, ms, stop_during=False):
         self.temp_token += 1
@@ -721,7 +2406,7 @@ class Pet(QtWidgets.QMainWindow):
         self.set_action(key, force=True, suppress_bounce=True)
         if stop_during:
             self.stop_move = True
-        self.force_action_until = time.monotonic() + (ms/1000.0)
+        self.force_action_until = session.now() + (ms/1000.0)
 
         def _end():
             if tok != self.temp_token:
@@ -730,20 +2415,16 @@ class Pet(QtWidgets.QMainWindow):
             self.force_action_until = 0.0
             if stop_during:
                 self.stop_move = False
-            if self.mode == "normal":
+            if self.state is PetState.NORMAL:
                 self.set_action("idle", force=True, suppress_bounce=True)
-        QtCore.QTimer.singleShot(ms, _end)
+        self._single_shot(ms, _end)
 
     def _play_walk_fall(self, direction: str):
         fall_action = "fall_left" if direction == "left" else "fall_right"
-        if fall_action not in self.animations:
+        if not self._ensure_action(fall_action):
             return
-        now = time.monotonic()
-        raw = self.raw_animations.get(fall_action)
-        if raw:
-            total_sec = sum(d for (_pm, d) in raw)
-        else:
-            total_sec = 1.2
+        now = session.now()
+        total_sec = self.anim_meta[fall_action][1] or 1.2
         was_random = self.random_walk
         self.random_walk = False
 
@@ -774,15 +2455,36 @@ class Pet(QtWidgets.QMainWindow):
                     self.set_action("walk_right", force=True, suppress_bounce=False)
             else:
                 self.set_action("idle", force=True, suppress_bounce=False)
-        QtCore.QTimer.singleShot(int(total_sec * 1000), _end_fall)
+        self._single_shot(int(total_sec * 1000), _end_fall)
+
+    def _single_shot(self, ms: int, fn):
+        # 임시 모션 종료는 항상 마지막 예약만 유효하므로 펫당 타이머 하나를 다시 건다.
+        # 클릭할 때마다 타이머를 새로 만들지 않는다
+        self._temp_end = fn
+        self.temp_timer.start(ms)
+
+    def _on_temp_timer(self):
+        fn, self._temp_end = self._temp_end, None
+        if fn is not None:
+            fn()
 
     # ===== 마우스 =====
+    def _record_mouse(self, kind: str, ev):
+        gp = ev.globalPos()
+        session.record("mouse", pet=self.pid, kind=kind, gx=gp.x(), gy=gp.y(),
+                       button=int(ev.button()), buttons=int(ev.buttons()))
+
     def mousePressEvent(self, ev):
-        if self.mode == "game_obstacle":
+        self._record_mouse("press", ev)
+        if self.state is PetState.GAME_OBSTACLE:
             if ev.button() == QtCore.Qt.LeftButton:
                 self._game_obstacle_click()
             return
-        if self.mode and self.mode.startswith("game_"):
+        if self.state in GAME_STATES:
+            return
+        if not self._hit_at(ev.pos()):
+            ev.ignore()
+            self._set_pass_through(True)
             return
 
         if ev.button() == QtCore.Qt.LeftButton:
@@ -792,21 +2494,25 @@ class Pet(QtWidgets.QMainWindow):
             self.single_click_timer.start(interval)
             self.press_pos = ev.globalPos()
             self.dragging = False
-            self.drag_offset = ev.globalPos() - self.frameGeometry().topLeft()
+            self.drag_offset = ev.globalPos() - self.pos()
             self.drag_trace.clear()
 
     def mouseMoveEvent(self, ev):
-        if self.mode and self.mode.startswith("game_"):
+        if ev.buttons():
+            self._record_mouse("move", ev)
+        if self.state in GAME_STATES:
             return
         if self.giant_animating:
             return
         if self.press_pos is None:
+            if not ev.buttons() and not self._hit_at(ev.pos()):
+                self._set_pass_through(True)
             return
         if not self.dragging:
             if (ev.globalPos() - self.press_pos).manhattanLength() >= self.drag_threshold:
                 self.single_click_timer.stop()
                 self.dragging = True
-                if self.mode not in ("dance","sleep","exercise","cleaning"):
+                if self.state not in POSED_STATES:
                     self.set_action("hang", force=True, suppress_bounce=True)
         if self.dragging:
             self._record_drag(ev.globalPos())
@@ -816,11 +2522,11 @@ class Pet(QtWidgets.QMainWindow):
                 self.is_climbing = False
                 self.climb_locked_from_drag = False
                 self.climb_side = None
-                if self.mode not in ("dance","sleep","exercise","cleaning"):
+                if self.state not in POSED_STATES:
                     self.set_action("hang", force=True, suppress_bounce=True)
                 return
 
-            if (self.mode not in ("dance","sleep","exercise","cleaning")
+            if (self.state not in POSED_STATES
                 and not self.is_giant
                 and not self.is_climbing):
                 desk = self._desktop_rect()
@@ -830,15 +2536,16 @@ class Pet(QtWidgets.QMainWindow):
                     self.move(desk.x(), cur_y)
                     self.set_action("climb_left", force=True, suppress_bounce=False)
                     self.climb_locked_from_drag = True
-                    self.climb_lock_expire = time.monotonic() + self.CLIMB_HOLD_SEC
+                    self.climb_lock_expire = session.now() + self.CLIMB_HOLD_SEC
                 elif g.x() + self.width() >= desk.x() + desk.width() - EDGE_MARGIN:
                     self.move(desk.x() + desk.width() - self.width(), cur_y)
                     self.set_action("climb_right", force=True, suppress_bounce=False)
                     self.climb_locked_from_drag = True
-                    self.climb_lock_expire = time.monotonic() + self.CLIMB_HOLD_SEC
+                    self.climb_lock_expire = session.now() + self.CLIMB_HOLD_SEC
 
     def mouseReleaseEvent(self, ev):
-        if self.mode and self.mode.startswith("game_"):
+        self._record_mouse("release", ev)
+        if self.state in GAME_STATES:
             return
         if ev.button() != QtCore.Qt.LeftButton:
             return
@@ -848,7 +2555,7 @@ class Pet(QtWidgets.QMainWindow):
 
         if self.dragging:
             self.dragging = False
-            if self.mode in ("dance","sleep","exercise","cleaning"):
+            if self.state in POSED_STATES:
                 self.manual_drop = False
                 self.free_bounce = False
                 self.vx = 0.0
@@ -873,25 +2580,20 @@ class Pet(QtWidgets.QMainWindow):
         self.press_pos = None
 
     def _pin_climb_to_wall(self):
-        if not self.is_climbing or not self.climb_locked_from_drag:
-            return
-        desk = self._desktop_rect()
-        g = self.geometry()
-        y = g.y()
-        if self.climb_side == "left":
-            self.move(desk.x(), y)
-        elif self.climb_side == "right":
-            self.move(desk.x() + desk.width() - self.width(), y)
+        b = self._sync_body()
+        petsim.pin_climb_to_wall(b, self._sim_world(session.now()))
+        self.move(b.x, b.y)
 
     def mouseDoubleClickEvent(self, ev):
-        if self.mode and self.mode.startswith("game_"):
+        self._record_mouse("double", ev)
+        if self.state in GAME_STATES:
             return
         if ev.button() == QtCore.Qt.LeftButton:
             self.single_click_timer.stop()
             self._do_double_click()
 
     def _trigger_single_click(self):
-        if self.mode and self.mode.startswith("game_"):
+        if self.state in GAME_STATES:
             return
         self._do_single_click()
 
@@ -902,7 +2604,7 @@ class Pet(QtWidgets.QMainWindow):
         if self.random_walk and self.current_action == "walk_right":
             self._play_walk_fall("right")
             return
-        if self.mode in ("dance","sleep","exercise","cleaning"):
+        if self.state in POSED_STATES:
             return
         self._play_temp("surprise", 6000, stop_during=False)
 
@@ -913,13 +2615,13 @@ class Pet(QtWidgets.QMainWindow):
         if self.random_walk and self.current_action == "walk_right":
             self._play_walk_fall("right")
             return
-        if self.mode in ("dance","sleep","exercise","cleaning"):
+        if self.state in POSED_STATES:
             return
         self._play_temp("angry", 6000, stop_during=False)
 
     # ===== 드래그 속도 =====
     def _record_drag(self, gpos: QtCore.QPoint):
-        self.drag_trace.append((QtCore.QPoint(gpos), time.monotonic()))
+        self.drag_trace.append((QtCore.QPoint(gpos), session.now()))
 
     def _apply_throw_velocity(self):
         if len(self.drag_trace) < 2:
@@ -932,11 +2634,11 @@ class Pet(QtWidgets.QMainWindow):
         dt = max(1e-3, (t2 - t1))
         dx = p2.x() - p1.x()
         dy = p2.y() - p1.y()
-        frames = dt / 0.016
+        frames = dt / petsim.TICK_SEC     # 속도는 px/tick
         self.vx = dx / max(1.0, frames)
         self.vy = dy / max(1.0, frames)
         spd = math.hypot(self.vx, self.vy)
-        if spd >= FREE_BOUNCE_SPEED_TH:
+        if spd >= petsim.FREE_BOUNCE_SPEED_TH:
             self.free_bounce = True
             self.manual_drop = False
             self.bounce_count = 0
@@ -947,7 +2649,7 @@ class Pet(QtWidgets.QMainWindow):
 
     # ===== 운동 =====
     def _exercise_next(self):
-        if self.mode != "exercise":
+        if self.state is not PetState.EXERCISE:
             self.exercise_timer.stop()
             return
         self.exercise_idx = (self.exercise_idx + 1) % len(self.exercise_cycle)
@@ -955,25 +2657,23 @@ class Pet(QtWidgets.QMainWindow):
 
     # ===== 청소 모드 =====
     def _start_cleaning_mode(self):
-        self.mode = "cleaning"
+        self._set_state(PetState.CLEANING)
         self.clean_timer.start()
         self._cleaning_step()
-        self._refresh_menu_checks()
 
     def _stop_cleaning_mode(self):
         self.clean_timer.stop()
-        self.mode = "normal"
+        self._set_state(PetState.NORMAL)
         self.clean_vx = 0
-        self._refresh_menu_checks()
 
     def _cleaning_step(self):
-        if self.mode != "cleaning":
+        if self.state is not PetState.CLEANING:
             return
         choice = random.choice(["mopping", "clean_dust", "clean_left", "clean_right"])
         desk = self._desktop_rect()
 
         if choice in ("mopping", "clean_dust"):
-            if self.animations.get(choice):
+            if self._ensure_action(choice):
                 self.set_action(choice, force=True, suppress_bounce=True)
             w = self.width()
             h = self.height()
@@ -1001,205 +2701,60 @@ class Pet(QtWidgets.QMainWindow):
             self.bounce_count = 0
 
     def _update_cleaning(self):
-        if self.current_action not in ("clean_left", "clean_right"):
-            return
-        desk = self._desktop_rect()
-        g = self.geometry()
-        floor_y = desk.y() + desk.height() - self.height()
-        nx = g.x() + self.clean_vx
-        if nx <= desk.x():
-            nx = desk.x()
-            self.clean_vx = abs(self.clean_vx)
-            self.set_action("clean_right", force=True, suppress_bounce=True)
-        elif nx + self.width() >= desk.x() + desk.width():
-            nx = desk.x() + desk.width() - self.width()
-            self.clean_vx = -abs(self.clean_vx)
-            self.set_action("clean_left", force=True, suppress_bounce=True)
-        self.move(nx, floor_y)
-        self.manual_drop = False
-        self.free_bounce = False
-        self.vy = 0.0
-        self.bounce_count = 0
+        b = self._sync_body()
+        self._apply_sim(b, petsim.step_cleaning(b, self._sim_world(session.now())))
 
     # ===== 메인 루프 =====
     def update_loop(self):
-        now = time.monotonic()
+        t0 = time.perf_counter()
+        now = session.now()
+        self.mgr.frame_stats.interval("tick", self, now)
+        self._update_step(now)
+        self._commit_geometry()
+        if self._pass_through:
+            self._poll_pass_through()
+        self.mgr.frame_stats.cost(self, (time.perf_counter() - t0) * 1000.0)
+
+    def _update_step(self, now: float):
         self._update_animation(now)
+        self._tick_state(now)
 
-        if self.mode and self.mode.startswith("game_"):
-            return
-
-        if self.mode in ("dance","sleep","exercise"):
-            self.manual_drop = False
-            self.free_bounce = False
-            return
-
-        if self.mode == "cleaning":
-            self._update_cleaning()
-            return
+    def _tick_game(self, now: float):
+        pass    # 미니게임은 game_timer 가 움직인다
 
-        if self.is_climbing and self.climb_locked_from_drag and not self.dragging:
-            if now < self.climb_lock_expire:
-                self._pin_climb_to_wall()
-                return
-            else:
-                self.climb_locked_from_drag = False
-                self.is_climbing = False
-                self.climb_side = None
-                self.manual_drop = True
-                self.free_bounce = False
-                self.vy = 0.0
-                self.bounce_count = 0
+    def _tick_posed(self, now: float):
+        self.manual_drop = False
+        self.free_bounce = False
 
-        desk = self._desktop_rect()
-        g = self.geometry()
-        left_edge  = desk.x()
-        right_edge = desk.x() + desk.width() - self.width()
-        bottom_win = self._floor_y_window()
+    def _tick_cleaning(self, now: float):
+        self._update_cleaning()
 
-        if self.free_bounce:
-            self._update_free_bounce()
-            return
+    def _tick_normal(self, now: float):
+        b = self._sync_body()
+        self._apply_sim(b, petsim.step_normal(b, self._sim_world(now)))
 
-        if not self.dragging:
-            if self.manual_drop:
-                self.vy += GRAVITY
-                ny = g.y() + int(self.vy)
-                if ny >= bottom_win:
-                    if abs(self.vy) > BOUNCE_MIN_VEL and self.bounce_count < BOUNCE_MAX:
-                        self.vy = -abs(self.vy) * BOUNCE_K
-                        if self.vy > -BOUNCE_UP_VEL_FLOOR:
-                            self.vy = -BOUNCE_UP_VEL_FLOOR
-                        self.bounce_count += 1
-                        ny = bottom_win - 1
-                    else:
-                        ny = bottom_win
-                        self.vy = 0.0
-                        self.bounce_count = 0
-                        self.manual_drop = False
-                self.move(g.x(), ny)
-            else:
-                if g.y() < bottom_win:
-                    self.vy += GRAVITY
-                    ny = g.y() + int(self.vy)
-                    if ny >= bottom_win:
-                        if abs(self.vy) > BOUNCE_MIN_VEL and self.bounce_count < BOUNCE_MAX:
-                            self.vy = -abs(self.vy) * BOUNCE_K
-                            if self.vy > -BOUNCE_UP_VEL_FLOOR:
-                                self.vy = -BOUNCE_UP_VEL_FLOOR
-                            self.bounce_count += 1
-                            ny = bottom_win - 1
-                        else:
-                            ny = bottom_win
-                            self.vy = 0.0
-                            self.bounce_count = 0
-                    self.move(g.x(), ny)
-                else:
-                    self.vy = 0.0
-                    self.move(g.x(), bottom_win)
+    # ===== 시뮬레이션 코어 연결 =====
+    def _sync_body(self):
+        b = self.body
+        g = self._geo
+        b.x, b.y, b.w, b.h = g.x(), g.y(), g.width(), g.height()
+        b.action = self.current_action
+        return b
 
-        if self.manual_drop:
-            return
-
-        if self.dragging:
-            return
-
-        if self.follow_mouse and not self.active_temp_action:
-            mp = QtGui.QCursor.pos()
-            cx = g.x() + self.width()//2
-            dist = abs(mp.x() - cx)
-            if dist <= FOLLOW_JUMP_NEAR:
-                if now >= self.force_action_until:
-                    self.force_action_until = now + FOLLOW_JUMP_HOLD
-                if self.current_action != "jump":
-                    self.set_action("jump", force=True, suppress_bounce=False)
-                self.move(g.x(), bottom_win)
-                self._snap_floor()
-                return
-            dx = mp.x() - cx
-            speed = 6 if dist > FOLLOW_FAST_DIST else 3
-            step = speed if dx > 0 else -speed
-            nx = max(left_edge, min(right_edge, g.x() + step))
-            self.move(nx, bottom_win)
-            self.vy = 0.0
-            self.manual_drop = False
-            self.bounce_count = 0
-            if dist > FOLLOW_RUN_DIST:
-                want = "run_right" if dx > 0 else "run_left"
-            else:
-                want = "walk_right" if dx > 0 else "walk_left"
-            if want != self.current_action:
-                self.set_action(want, suppress_bounce=False)
-            return
-
-        if self.random_walk and not self.active_temp_action:
-            vx = getattr(self, "rw_vx", None)
-            if vx is None or vx == 0:
-                vx = random.choice([-2, -1, 1, 2])
-            nx = self.x() + vx
-            if nx <= left_edge:
-                nx = left_edge
-                vx = abs(vx)
-            elif nx >= right_edge:
-                nx = right_edge
-                vx = -abs(vx)
-            self.rw_vx = vx
-            self.move(nx, bottom_win)
-            self.vy = 0.0
-            self.manual_drop = False
-            self.bounce_count = 0
-            self.set_action("walk_right" if vx > 0 else "walk_left", suppress_bounce=False)
-            return
-
-        if (not self.active_temp_action
-            and not self.follow_mouse
-            and not self.random_walk):
-            if self.current_action != "idle":
-                self.set_action("idle", suppress_bounce=False)
-
-    # ===== 사방 바운스 =====
-    def _update_free_bounce(self):
+    def _sim_world(self, now: float):
         desk = self._desktop_rect()
-        g = self.geometry()
-        nx = g.x() + int(self.vx)
-        ny = g.y() + int(self.vy)
-
-        if self.is_giant:
-            damp = GIANT_FREE_BOUNCE_DAMP
-            fric = GIANT_FREE_BOUNCE_FRICTION
-            min_spd = GIANT_FREE_BOUNCE_MIN_SPD
-        else:
-            damp = FREE_BOUNCE_DAMP
-            fric = FREE_BOUNCE_FRICTION
-            min_spd = FREE_BOUNCE_MIN_SPD
-
-        if nx <= desk.x():
-            nx = desk.x()
-            self.vx = -self.vx * damp
-        elif nx + self.width() >= desk.x() + desk.width():
-            nx = desk.x() + desk.width() - self.width()
-            self.vx = -self.vx * damp
-
-        if ny <= desk.y():
-            ny = desk.y()
-            self.vy = -self.vy * damp
-        elif ny + self.height() >= desk.y() + desk.height():
-            ny = desk.y() + desk.height() - self.height()
-            self.vy = -self.vy * damp
-
-        self.move(nx, ny)
-        self.vx *= fric
-        self.vy *= fric
-        spd = math.hypot(self.vx, self.vy)
-        if spd < min_spd:
-            self.free_bounce = False
-            self.manual_drop = True
-            self.bounce_count = 0
-            self.vx = 0.0
+        return petsim.World(desk.x(), desk.y(), desk.width(), desk.height(), now, _cursor_x)
+
+    def _apply_sim(self, b: petsim.Body, want):
+        self.move(b.x, b.y)
+        if want is not None:
+            action, force, suppress = want
+            self.set_action(action, force=force, suppress_bounce=suppress)
 
     # ===== 키보드 =====
     def keyPressEvent(self, ev):
-        if self.mode and self.mode.startswith("game_"):
+        session.record("key", pet=self.pid, key=int(ev.key()))
+        if self.state in GAME_STATES:
             if ev.key() == QtCore.Qt.Key_Escape:
                 self._exit_game_mode()
                 return
@@ -1213,11 +2768,13 @@ class Pet(QtWidgets.QMainWindow):
         super().keyPressEvent(ev)
 
     # ===== 미니게임 공통 =====
-    def _enter_game_mode(self, mode_name: str):
+    def _enter_game_mode(self, state: PetState):
         self._exit_modes()
-        self.mode = mode_name
+        self._set_pass_through(False)
+        self._set_state(state)
         self.mgr.game_lock = True
         self.game_paused = False
+        self.mgr.frame_stats.reset_timer("game_tick", self)
         self.game_timer.start()
         self.mgr.overlay.hide_text()
 
@@ -1227,7 +2784,7 @@ class Pet(QtWidgets.QMainWindow):
             w.deleteLater()
         self.game_widgets = []
         self.game_timer.stop()
-        self.mode = "normal"
+        self._set_state(PetState.NORMAL)
         self.mgr.game_lock = False
         self.mgr.overlay.hide_text()
         self._snap_floor_force()
@@ -1245,18 +2802,15 @@ class Pet(QtWidgets.QMainWindow):
         return pm
 
     def _game_tick(self):
+        self.mgr.frame_stats.interval("game_tick", self, session.now())
         if self.game_paused:
             return
-        if self.mode == "game_snack":
-            self._game_snack_tick()
-        elif self.mode == "game_obstacle":
-            self._game_obstacle_tick()
-        elif self.mode == "game_heading":
-            self._game_heading_tick()
+        if self._game_tick_state is not None:
+            self._game_tick_state()
 
     # ===== 간식먹기 =====
     def _start_game_snack(self):
-        self._enter_game_mode("game_snack")
+        self._enter_game_mode(PetState.GAME_SNACK)
         self.set_action("idle", force=True, suppress_bounce=True)
         scr = self._desktop_rect()
         self.move(scr.center().x() - self.width()//2,
@@ -1317,7 +2871,7 @@ class Pet(QtWidgets.QMainWindow):
         scr = self._desktop_rect()
         floor_y = scr.bottom() - self.height() - 2
 
-        pos = QtGui.QCursor.pos()
+        pos = session.cursor_pos()
         pet_x = pos.x() - self.width()//2
         pet_x = max(scr.x(), min(pet_x, scr.right()-self.width()))
         self.move(pet_x, floor_y)
@@ -1389,15 +2943,16 @@ class Pet(QtWidgets.QMainWindow):
         return "♥"*full + ("♡" if half else "")
 
     def _snack_grow_anim(self):
-        self.snack_grow_start = time.monotonic()
-        self.snack_grow_timer = QtCore.QTimer(self)
-        self.snack_grow_timer.setInterval(30)
-        self.snack_grow_timer.timeout.connect(self._snack_grow_step)
+        self.snack_grow_start = session.now()
+        if self.snack_grow_timer is None:
+            self.snack_grow_timer = session.Timer(self)
+            self.snack_grow_timer.setInterval(30)
+            self.snack_grow_timer.timeout.connect(self._snack_grow_step)
         self.snack_grow_timer.start()
 
     def _snack_grow_step(self):
         dur = 0.4
-        t = time.monotonic() - self.snack_grow_start
+        t = session.now() - self.snack_grow_start
         if t >= dur:
             self.scale = self.scale_base * 1.3
             self._rebuild_scaled_cache()
@@ -1421,7 +2976,7 @@ class Pet(QtWidgets.QMainWindow):
 
     # ===== 장애물 피하기 =====
     def _start_game_obstacle(self):
-        self._enter_game_mode("game_obstacle")
+        self._enter_game_mode(PetState.GAME_OBSTACLE)
         self.set_action("run_right", force=True, suppress_bounce=True)
         scr = self._desktop_rect()
         floor_y = scr.bottom() - self.height() - 2
@@ -1508,7 +3063,7 @@ class Pet(QtWidgets.QMainWindow):
 
     # ===== 헤딩하기 =====
     def _start_game_heading(self):
-        self._enter_game_mode("game_heading")
+        self._enter_game_mode(PetState.GAME_HEADING)
         self.set_action("jumping_jacks", force=True, suppress_bounce=True)
         scr = self._desktop_rect()
         floor_y = scr.bottom() - self.height() - 2
@@ -1530,7 +3085,7 @@ class Pet(QtWidgets.QMainWindow):
         floor_real = scr.bottom()
         floor_ball = floor_real - 4
 
-        pos = QtGui.QCursor.pos()
+        pos = session.cursor_pos()
         pet_x = pos.x() - self.width()//2
         pet_x = max(scr.left(), min(pet_x, scr.right()-self.width()))
         pet_y = scr.bottom() - self.height() - 2
@@ -1563,8 +3118,428 @@ class Pet(QtWidgets.QMainWindow):
         self.set_action("angry", force=True, suppress_bounce=True)
         self.mgr.overlay.show_text("GAME OVER", f"SCORE: {self.head_score}")
 
+    # ===== 헤딩하기 (여러 공) =====
+    def _start_game_multiball(self):
+        if np is None:
+            return
+        self._enter_game_mode(PetState.GAME_MULTIBALL)
+        self.set_action("jumping_jacks", force=True, suppress_bounce=True)
+        scr = self._desktop_rect()
+        self.move(scr.center().x() - self.width()//2, scr.bottom() - self.height() - 2)
+
+        # 공 상태는 열 하나가 공 하나인 배열로 두고 tick 마다 한 번에 계산한다
+        self.mb_x  = np.empty(0); self.mb_y = np.empty(0)
+        self.mb_vx = np.empty(0); self.mb_vy = np.empty(0)
+        self.mb_r  = np.empty(0, dtype=np.int32)
+        self.mb_gravity = 0.35
+        self.mb_bounce  = 1.02
+        self.mb_score   = 0
+        self.mb_lives   = HEAD_MULTI_LIVES
+        self.mb_next_add = session.now() + HEAD_MULTI_ADD_SEC
+        self.mb_layer = BallLayer(scr)
+        self.mb_layer.show()
+        self.game_widgets.append(self.mb_layer)
+        for _ in range(HEAD_MULTI_START):
+            self._add_multiball()
+        self.mgr.overlay.show_text("SCORE: 0", f"헤딩하기 ♥{self.mb_lives}")
+
+    def _add_multiball(self):
+        scr = self._desktop_rect()
+        x = random.uniform(scr.left() + 40, scr.right() - 40)
+        self.mb_x  = np.append(self.mb_x, x)
+        self.mb_y  = np.append(self.mb_y, scr.top() - random.uniform(20, 200))
+        self.mb_vx = np.append(self.mb_vx, random.uniform(-2.0, 2.0))
+        self.mb_vy = np.append(self.mb_vy, random.uniform(0.0, 2.5))
+        self.mb_r  = np.append(self.mb_r, random.choice(HEAD_MULTI_RADII)).astype(np.int32)
+
+    def _game_multiball_tick(self):
+        scr = self._desktop_rect()
+        pos = session.cursor_pos()
+        pet_x = max(scr.left(), min(pos.x() - self.width()//2, scr.right() - self.width()))
+        self.move(pet_x, scr.bottom() - self.height() - 2)
+
+        now = session.now()
+        if now >= self.mb_next_add and len(self.mb_x) < HEAD_MULTI_MAX:
+            self._add_multiball()
+            self.mb_next_add = now + HEAD_MULTI_ADD_SEC
+
+        x, y, vx, vy, r = self.mb_x, self.mb_y, self.mb_vx, self.mb_vy, self.mb_r
+        vy += self.mb_gravity
+        x += vx
+        y += vy
+        # 좌우 벽
+        left, right = scr.left() + r, scr.right() - r
+        hit_wall = (x < left) | (x > right)
+        vx[hit_wall] *= -1.0
+        np.clip(x, left, right, out=x)
+
+        # 머리 판정 (원과 사각형의 겹침을 공 전체에 한 번에)
+        hx0 = pet_x + self.width() * 0.15
+        hx1 = hx0 + self.width() * 0.7
+        hy0 = self.y()
+        hy1 = hy0 + self.height() * 0.4
+        heads = (vy > 0) & (x + r >= hx0) & (x - r <= hx1) & (y + r >= hy0) & (y - r <= hy1)
+        n_heads = int(heads.sum())
+        if n_heads:
+            vy[heads] = -np.abs(vy[heads]) * self.mb_bounce
+            self.mb_score += n_heads
+            self.mb_gravity = min(self.mb_gravity + 0.01 * n_heads, 1.2)
+            self.mb_bounce  = min(self.mb_bounce + 0.005 * n_heads, 1.35)
+
+        # 바닥에 떨어진 공은 빼고 목숨 차감
+        dropped = y + r >= scr.bottom() - 4
+        n_drop = int(dropped.sum())
+        if n_drop:
+            keep = ~dropped
+            self.mb_x, self.mb_y = x[keep], y[keep]
+            self.mb_vx, self.mb_vy, self.mb_r = vx[keep], vy[keep], r[keep]
+            self.mb_lives -= n_drop
+            if self.mb_lives <= 0:
+                self.mb_layer.set_balls(self.mb_x, self.mb_y, self.mb_r)
+                self._game_multiball_over()
+                return
+            if not len(self.mb_x):
+                self._add_multiball()
+
+        self.mb_layer.set_balls(self.mb_x, self.mb_y, self.mb_r)
+        if n_heads or n_drop:
+            self.mgr.overlay.show_text(f"SCORE: {self.mb_score}", f"헤딩하기 ♥{self.mb_lives}")
+
+    def _game_multiball_over(self):
+        self.game_timer.stop()
+        self.set_action("angry", force=True, suppress_bounce=True)
+        self.mgr.overlay.show_text("GAME OVER", f"SCORE: {self.mb_score}")
+
+
+# ==========================
+# 로컬 제어 소켓
+# ==========================
+class ControlServer(QtCore.QObject):
+    # 한 줄 = JSON 배치 하나 ({"cmds": [...]} 또는 명령 목록). 응답도 한 줄로 돌려준다.
+    # 배치 안의 명령은 readyRead 한 번 안에서 순서대로 모두 처리한다
+    MODE_KEYS = {"dance": "dance", "sleep": "sleep", "exercise": "exercise", "cleaning": "clean",
+                 "game_snack": "game_snack", "game_obstacle": "game_obstacle",
+                 "game_heading": "game_heading", "game_multiball": "game_multiball"}
+
+    def __init__(self, manager: PetManager, name: str):
+        super().__init__()
+        self.mgr = manager
+        self.server = QtNetwork.QLocalServer(self)
+        self.server.setSocketOptions(QtNetwork.QLocalServer.UserAccessOption)
+        QtNetwork.QLocalServer.removeServer(name)     # 비정상 종료로 남은 소켓 파일
+        if not self.server.listen(name):
+            print(f"제어 소켓 열기 실패: {self.server.errorString()}", file=sys.stderr)
+            return
+        self.server.newConnection.connect(self._on_connection)
+
+    def _on_connection(self):
+        while self.server.hasPendingConnections():
+            sock = self.server.nextPendingConnection()
+            sock.readyRead.connect(lambda s=sock: self._on_ready(s))
+            sock.disconnected.connect(sock.deleteLater)
+
+    def _on_ready(self, sock):
+        while sock.canReadLine():
+            line = bytes(sock.readLine()).strip()
+            if not line:
+                continue
+            try:
+                batch = json.loads(line)
+                cmds = batch.get("cmds", []) if isinstance(batch, dict) else batch
+                results = [self._run(cmd) for cmd in cmds]
+                reply = {"ok": True, "results": results}
+            except (ValueError, AttributeError, TypeError) as e:
+                reply = {"ok": False, "error": str(e)}
+            sock.write(json.dumps(reply, ensure_ascii=False).encode("utf-8") + b"\n")
+        sock.flush()
+
+    def _select(self, sel):
+        if sel is None or sel == "all":
+            return list(self.mgr.pets)
+        pids = {sel} if isinstance(sel, int) else set(sel)
+        return [p for p in self.mgr.pets if p.pid in pids]
+
+    def _run(self, cmd: dict):
+        op = cmd.get("op")
+        try:
+            handler = getattr(self, "_op_" + str(op))
+        except AttributeError:
+            return {"error": f"알 수 없는 명령: {op}"}
+        try:
+            return handler(cmd)
+        except (KeyError, ValueError, TypeError, IndexError) as e:
+            return {"error": f"{op}: {e}"}
+
+    def _op_spawn(self, cmd):
+        char = self.mgr.chars.get(cmd["char"]) if "char" in cmd else None
+        pos = QtCore.QPoint(int(cmd["x"]), int(cmd["y"])) if "x" in cmd else None
+        pids = []
+        for _ in range(int(cmd.get("n", 1))):
+            pet = self.mgr.spawn(pos, char=char)
+            if pet is None:
+                break
+            pids.append(pet.pid)
+        return {"pids": pids}
+
+    def _op_remove(self, cmd):
+        pets = self._select(cmd.get("pets"))
+        for pet in pets:
+            self.mgr.remove(pet)
+        return {"removed": [p.pid for p in pets]}
+
+    def _op_mode(self, cmd):
+        mode = cmd["mode"]
+        if mode != "normal" and mode not in self.MODE_KEYS:
+            raise ValueError(f"모드 없음: {mode}")
+        pets = self._select(cmd.get("pets"))
+        for pet in pets:
+            if pet.mode == mode:
+                continue
+            if pet.state in GAME_STATES:
+                pet._exit_game_mode()
+            else:
+                pet._exit_modes()
+            if mode.startswith("game_") and self.mgr.game_lock:
+                continue    # 미니게임은 한 번에 한 펫만
+            if mode != "normal":
+                pet._on_menu_action(self.MODE_KEYS[mode])
+        return {"pets": [p.pid for p in pets]}
+
+    def _op_action(self, cmd):
+        action = cmd["action"]
+        pets = self._select(cmd.get("pets"))
+        missing = [p.pid for p in pets if action not in p.char.actions]
+        if missing:
+            raise ValueError(f"액션 없음: {action} (pets {missing})")
+        for pet in pets:
+            pet._play_temp(action, int(cmd.get("ms", 6000)))
+        return {"pets": [p.pid for p in pets]}
+
+    def _op_walk(self, cmd):
+        pets = self._select(cmd.get("pets"))
+        for pet in pets:
+            pet.follow_mouse = cmd.get("walk") == "follow"
+            pet.random_walk  = cmd.get("walk") == "random"
+        return {"pets": [p.pid for p in pets]}
+
+    def _op_scale(self, cmd):
+        pets = self._select(cmd.get("pets"))
+        base = SCALE_PRESETS[int(cmd["preset"])][1] if "preset" in cmd else float(cmd["scale"])
+        for pet in pets:
+            pet.scale_base = base
+            pet._set_scale(base * (GIANT_SCALE_FACTOR if pet.is_giant else 1.0))
+            pet._snap_floor_force()
+            pet._commit_geometry()
+        return {"pets": [p.pid for p in pets]}
+
+    def _op_move(self, cmd):
+        pets = self._select(cmd.get("pets"))
+        for pet in pets:
+            pet.move(int(cmd["x"]), int(cmd["y"]))
+            pet._commit_geometry()
+        return {"pets": [p.pid for p in pets]}
+
+    def _op_max_pets(self, cmd):
+        self.mgr.MAX_PETS = int(cmd["n"])
+        return {"max_pets": self.mgr.MAX_PETS}
+
+    def _op_trace(self, cmd):
+        try:
+            res = self.mgr.dump_trace(cmd.get("path"))
+        except OSError as e:
+            raise ValueError(f"저장 실패: {e}")
+        if res is None:
+            raise ValueError("PET_TRACE 가 꺼져 있음")
+        return {"path": res[0], "events": res[1]}
+
+    def _op_stats(self, cmd):
+        return {
+            "pets": [{"pid": p.pid, "char": p.char.name, "mode": p.mode,
+                      "action": p.current_action, "x": p.x(), "y": p.y(),
+                      "scale": p.scale, "visible": p.render_visible} for p in self.mgr.pets],
+            "max_pets": self.mgr.MAX_PETS,
+            "quality": self.mgr.quality.level,
+            "frame_stats": self.mgr.frame_stats.summary(),
+            "chars": {c.name: {"actions": len(c.frames), "decodes": c.decodes, "bytes": c.nbytes}
+                      for c in self.mgr.chars.chars.values()},
+        }
+
+
+# ==========================
+# 멀티 프로세스 샤딩
+# ==========================
+class ShardLink(QtCore.QObject):
+    # 워커 쪽: 조정자 파이프를 주기적으로 비우고 명령을 PetManager 에 적용
+    def __init__(self, conn, shard_id: int):
+        super().__init__()
+        self.conn = conn
+        self.shard_id = shard_id
+        self.mgr = None
+        self.stores = {}
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(SHARD_POLL_MS)
+        self.timer.timeout.connect(self._poll)
+
+    def start(self, mgr: PetManager, pages: dict):
+        self.mgr = mgr
+        for name, (shm_name, manifest) in pages.items():
+            self._install(name, shm_name, manifest)
+        self.timer.start()
+
+    def send(self, *msg):
+        try:
+            self.conn.send(msg)
+        except (OSError, EOFError):
+            self.mgr.app.quit()
+
+    def _install(self, name, shm_name, manifest):
+        char = self.mgr.chars.get(name)
+        if char is None or name in self.stores:
+            return
+        store = self.stores[name] = SharedFrameStore.attach(shm_name, manifest)
+        store.install(char)
+
+    def _poll(self):
+        try:
+            while self.conn.poll():
+                self._handle(*self.conn.recv())
+        except (OSError, EOFError):
+            self.mgr.app.quit()     # 조정자가 사라짐
+
+    def _handle(self, kind, *args):
+        mgr = self.mgr
+        if kind == "spawn":
+            pid, name, pos = args
+            pet = mgr.spawn(None if pos is None else QtCore.QPoint(*pos),
+                            char=mgr.chars.get(name), pid=pid)
+            if pet is None:
+                self.send("removed", pid)
+        elif kind == "pages":
+            self._install(*args)
+        elif kind == "game_lock":
+            mgr._game_lock = args[0]
+        elif kind == "quit":
+            mgr.app.quit()
+
+
+def shard_worker_main(conn, shard_id: int, pages: dict):
+    QtWidgets.QApplication.setAttribute(QtCore.Qt.AA_EnableHighDpiScaling, True)
+    QtWidgets.QApplication.setAttribute(QtCore.Qt.AA_UseHighDpiPixmaps, True)
+    app = QtWidgets.QApplication(sys.argv[:1])
+    app.setQuitOnLastWindowClosed(False)
+    if TRACE_PATH:
+        root, ext = os.path.splitext(TRACE_PATH)
+        install_tracer(f"{root}.shard{shard_id}{ext or '.json'}")
+    link = ShardLink(conn, shard_id)
+    mgr = PetManager(app, link)
+    mgr.snapshot_timer.stop()
+    link.start(mgr, pages)
+    app.exec_()
+    for store in link.stores.values():
+        store.close()
+
+
+class ShardCoordinator(QtCore.QObject):
+    # 조정자: 펫 창은 없고 프레임 공유 메모리와 워커, 전체 펫 수/미니게임 잠금만 관리
+    def __init__(self, app, n_shards: int):
+        super().__init__()
+        self.app = app
+        self.chars = CharacterRegistry(ASSETS_DIR, find_archive())
+        self.stores = {}
+        self.shards = []        # [프로세스, 파이프, 펫 수]
+        self.next_pid = 0
+        self.game_lock = False
+        default = self.chars.default
+        self._ensure_store(default.name, broadcast=False)
+        pages = {name: (st.shm.name, st.manifest) for name, st in self.stores.items()}
+        ctx = multiprocessing.get_context("spawn")
+        for i in range(n_shards):
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(target=shard_worker_main, args=(child, i, pages), daemon=True)
+            proc.start()
+            child.close()
+            self.shards.append([proc, parent, 0])
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(SHARD_POLL_MS)
+        self.timer.timeout.connect(self._poll)
+        self.timer.start()
+        app.aboutToQuit.connect(self.shutdown)
+        # SIGTERM 에도 shutdown 을 거쳐 공유 메모리를 지운다 (핸들러는 _poll 타이머 사이에 돈다)
+        signal.signal(signal.SIGTERM, lambda *_: self.app.quit())
+
+    def _ensure_store(self, name, broadcast=True):
+        if name in self.stores:
+            return True
+        char = self.chars.get(name)
+        if char is None:
+            return False
+        st = self.stores[name] = SharedFrameStore.build(char)
+        if broadcast:
+            self._broadcast("pages", name, st.shm.name, st.manifest)
+        return True
+
+    def _broadcast(self, *msg, skip=None):
+        for i, (proc, conn, _n) in enumerate(self.shards):
+            if i != skip and proc.is_alive():
+                try:
+                    conn.send(msg)
+                except OSError:
+                    pass
+
+    def spawn(self, name=None, pos=None):
+        if self.game_lock or sum(n for (_p, _c, n) in self.shards) >= PetManager.MAX_PETS:
+            return None
+        name = name or self.chars.default.name
+        if not self._ensure_store(name):
+            return None
+        alive = [i for i, (proc, _c, _n) in enumerate(self.shards) if proc.is_alive()]
+        if not alive:
+            return None
+        i = min(alive, key=lambda k: self.shards[k][2])
+        pid = self.next_pid
+        self.next_pid += 1
+        self.shards[i][1].send(("spawn", pid, name, pos))
+        self.shards[i][2] += 1
+        return pid
+
+    def _poll(self):
+        for i, shard in enumerate(self.shards):
+            proc, conn, _n = shard
+            try:
+                while conn.poll():
+                    self._handle(i, *conn.recv())
+            except (OSError, EOFError):
+                shard[2] = 0
+            if not proc.is_alive():
+                shard[2] = 0
+        if not any(proc.is_alive() and n for (proc, _c, n) in self.shards):
+            self.app.quit()
+
+    def _handle(self, i, kind, *args):
+        if kind == "spawn_req":
+            self.spawn(*args)
+        elif kind == "removed":
+            self.shards[i][2] = max(0, self.shards[i][2] - 1)
+        elif kind == "game_lock":
+            self.game_lock = args[0]
+            self._broadcast("game_lock", args[0], skip=i)
+
+    def shutdown(self):
+        self.timer.stop()
+        self._broadcast("quit")
+        for proc, conn, _n in self.shards:
+            proc.join(timeout=2.0)
+            if proc.is_alive():
+                proc.terminate()
+            conn.close()
+        for st in self.stores.values():
+            st.close()
+        self.stores = {}
+
 
 def main():
+    # 프로세스 디코딩 백엔드가 frozen 빌드에서도 워커를 띄울 수 있도록
+    multiprocessing.freeze_support()
     # DPI 옵션 설정
     QtWidgets.QApplication.setAttribute(QtCore.Qt.AA_EnableHighDpiScaling, True)
     QtWidgets.QApplication.setAttribute(QtCore.Qt.AA_UseHighDpiPixmaps, True)
@@ -1577,8 +3552,28 @@ def main():
             QtCore.Qt.HighDpiScaleFactorRoundingPolicy.PassThrough
         )
 
+    global session
+    if os.environ.get("PET_RECORD"):
+        session = RecordingSession(os.environ["PET_RECORD"], app)
+
+    if SHARDS > 0:
+        coord = ShardCoordinator(app, SHARDS)
+        coord.spawn()
+        sys.exit(app.exec_())
+
+    if TRACE_PATH:
+        install_tracer(TRACE_PATH)
     mgr = PetManager(app)
-    mgr.spawn()
+    if CONTROL_NAME:
+        mgr.control = ControlServer(mgr, CONTROL_NAME)
+    if isinstance(session, RecordingSession):
+        # replay.py 는 펫 하나를 새로 띄운 상태에서 시작한다 — 기록도 같은 상태에서 시작해야
+        # 그대로 재생된다. 사용자 스냅샷은 읽지도 덮어쓰지도 않는다
+        mgr.snapshot_timer.stop()
+        mgr.persist = False
+        mgr.spawn()
+    elif not mgr.restore_snapshot():
+        mgr.spawn()
     sys.exit(app.exec_())
 
 
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+# Pillow 로 GIF 를 프로세스 풀에서 나눠 디코딩하는 선택적 백엔드 (PET_DECODE_BACKEND=process)
+#
+# 워커는 디코딩한 RGBA 프레임을 공유 메모리 블록 하나에 이어 붙여 쓰고 이름만 돌려준다.
+# GUI 프로세스는 그 버퍼를 복사 없이 QImage 로 감싼 뒤 블록을 바로 해제한다.
+# 동시에 살아있는 블록 수를 max_inflight 로 묶어서 최대 메모리를 제한한다.
+import importlib.util, multiprocessing, os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import resource_tracker, shared_memory
+
+# main.MIN_FRAME_DELAY 와 같은 값. 이 모듈이 main 을 import 하지 않도록 따로 둔다
+# (spawn 워커는 실행한 스크립트(main.py)를 __mp_main__ 으로 다시 import 하므로 PyQt 자체는 로드된다)
+MIN_FRAME_DELAY = 40
+
+
+def available():
+    # 설치 여부만 본다 — 실제 import 는 워커 안에서
+    return importlib.util.find_spec("PIL") is not None
+
+
+def _decode_into_shm(path: str):
+    from PIL import Image
+
+    with Image.open(path) as im:
+        w, h = im.size
+        n = getattr(im, "n_frames", 1)
+        frame_size = w * h * 4
+        shm = shared_memory.SharedMemory(create=True, size=max(1, n * frame_size))
+        # 블록의 소유권은 GUI 프로세스로 넘어가므로 여기서는 추적하지 않는다
+        resource_tracker.unregister(shm._name, "shared_memory")
+        delays = []
+        try:
+            for i in range(n):
+                im.seek(i)
+                frame = im.convert("RGBA")
+                if frame.size != (w, h):
+                    canvas = Image.new("RGBA", (w, h))
+                    canvas.paste(frame, (0, 0))
+                    frame = canvas
+                shm.buf[i*frame_size:(i+1)*frame_size] = frame.tobytes()
+                d = im.info.get("duration", 0) or 0
+                if d <= 0: d = MIN_FRAME_DELAY
+                delays.append(d / 1000.0)
+        finally:
+            shm.close()
+    return shm.name, len(delays), w, h, delays
+
+
+class DecodedFrames:
+    def __init__(self, shm, n, w, h, delays):
+        self.shm = shm
+        self.n, self.w, self.h = n, w, h
+        self.delays = delays
+        self._views = []
+
+    def frame_view(self, i: int) -> memoryview:
+        size = self.w * self.h * 4
+        view = self.shm.buf[i*size:(i+1)*size]
+        self._views.append(view)
+        return view
+
+    def release(self):
+        for v in self._views:
+            v.release()
+        self._views = []
+        try:
+            self.shm.close()
+        except BufferError:
+            pass    # 아직 누가 버퍼를 잡고 있으면 매핑은 GC 때 풀린다
+        self.shm.unlink()
+
+
+def decode_parallel(jobs: dict, workers: int = None, max_inflight: int = None):
+    # jobs: {key: gif 경로} → (key, DecodedFrames | None) 를 끝나는 순서대로 yield.
+    # 소비자가 다음 값을 요청하면 앞서 넘긴 블록은 해제된다.
+    workers = workers or os.cpu_count() or 2
+    max_inflight = max_inflight or workers * 2
+    ctx = multiprocessing.get_context("spawn")
+    todo = iter(jobs.items())
+    pending = {}
+
+    with ProcessPoolExecutor(max_workers=min(workers, max(1, len(jobs))), mp_context=ctx) as pool:
+        def fill():
+            while len(pending) < max_inflight:
+                nxt = next(todo, None)
+                if nxt is None:
+                    return
+                key, path = nxt
+                pending[pool.submit(_decode_into_shm, str(path))] = key
+
+        try:
+            fill()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    key = pending.pop(fut)
+                    try:
+                        name, n, w, h, delays = fut.result()
+                    except Exception:
+                        yield key, None
+                        continue
+                    dec = DecodedFrames(shared_memory.SharedMemory(name=name), n, w, h, delays)
+                    try:
+                        yield key, dec
+                    finally:
+                        dec.release()
+                fill()
+        finally:
+            # 중간에 멈춘 경우 남은 작업의 블록도 정리
+            for fut in pending:
+                try:
+                    name = fut.result()[0]
+                except Exception:
+                    continue
+                shm = shared_memory.SharedMemory(name=name)
+                shm.close()
+                shm.unlink()
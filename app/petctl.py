@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+# PET_CONTROL 로 연 제어 소켓에 명령 배치를 보내는 클라이언트
+#
+#   PET_CONTROL=yujeong python app/main.py
+#   python app/petctl.py --name yujeong spawn n=20
+#   python app/petctl.py --name yujeong mode pets=all mode=dance -- scale pets=0,1 preset=2
+#   python app/petctl.py --name yujeong --json '{"cmds": [{"op": "stats"}]}'
+#   python app/petctl.py --name yujeong trace path=stutter.json   # PET_TRACE 로 켠 경우
+#
+# "--" 로 나눈 명령들은 한 배치로 보내져 펫 쪽 이벤트 루프 한 번에 같이 적용된다.
+import argparse, json, os, sys
+from PyQt5 import QtCore, QtNetwork
+
+
+def parse_value(v: str):
+    if "," in v:
+        return [parse_value(x) for x in v.split(",") if x]
+    try:
+        return json.loads(v)
+    except ValueError:
+        return v
+
+
+def parse_cmds(words):
+    # ["spawn", "n=3", "--", "stats"] → [{"op": "spawn", "n": 3}, {"op": "stats"}]
+    cmds, cur = [], None
+    for w in words:
+        if w == "--":
+            cur = None
+            continue
+        if cur is None:
+            cur = {"op": w}
+            cmds.append(cur)
+            continue
+        k, _, v = w.partition("=")
+        cur[k] = parse_value(v)
+    return cmds
+
+
+def send(name: str, batch, timeout_ms: int = 5000):
+    app = QtCore.QCoreApplication.instance() or QtCore.QCoreApplication(sys.argv[:1])
+    sock = QtNetwork.QLocalSocket()
+    sock.connectToServer(name)
+    if not sock.waitForConnected(timeout_ms):
+        raise ConnectionError(f"{name}: {sock.errorString()}")
+    sock.write(json.dumps(batch, ensure_ascii=False).encode("utf-8") + b"\n")
+    sock.flush()
+    buf = b""
+    while not buf.endswith(b"\n"):
+        if not sock.waitForReadyRead(timeout_ms):
+            raise TimeoutError(f"{name}: 응답 없음")
+        buf += bytes(sock.readAll())
+    sock.disconnectFromServer()
+    del app
+    return json.loads(buf)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="실행 중인 펫에 제어 명령 보내기")
+    ap.add_argument("--name", default=os.environ.get("PET_CONTROL", ""), help="PET_CONTROL 에 준 이름")
+    ap.add_argument("--json", default=None, help="배치 JSON 을 그대로 보냄")
+    ap.add_argument("cmd", nargs=argparse.REMAINDER)
+    args = ap.parse_args(argv)
+    if not args.name:
+        ap.error("--name 또는 PET_CONTROL 필요")
+
+    batch = json.loads(args.json) if args.json else {"cmds": parse_cmds(args.cmd)}
+    try:
+        reply = send(args.name, batch)
+    except (ConnectionError, TimeoutError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(json.dumps(reply, ensure_ascii=False, indent=2))
+    return 0 if reply.get("ok") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+# 펫 물리/이동 규칙만 떼어 낸 순수 파이썬 코어 (Qt 없이 돈다)
+#
+# Pet 창은 tick 마다 Body 에 자기 위치/크기를 채우고 World 를 만들어 step_* 를 부른 뒤
+# 바뀐 Body 위치로 창을 옮기고, 돌려받은 액션 요청을 set_action 으로 넘기기만 한다.
+#
+# 고정 tick 계약: step_* 한 번이 TICK_MS 만큼의 시간이다. dt 를 받지 않고 속도(vx, vy)는
+# px/tick, 중력·마찰·걷기 속도도 tick 당 값이다. 그래서 부르는 쪽은 반드시 TICK_MS 마다
+# 한 번씩 부른다 — Pet 의 tick 타이머와 던지기 속도 환산, 아래 벤치마크가 모두 이 값을 쓴다.
+# 다른 주기로 돌리고 싶으면 그 주기 안에서 TICK_MS 단위로 여러 번 부른다.
+#
+#   python app/petsim.py --pets 1000 --seconds 60   # 렌더링 없이 tick 처리량 측정
+import argparse, math, random, sys, time
+
+GRAVITY             = 1.1
+BOUNCE_K            = 0.78
+BOUNCE_MAX          = 4
+BOUNCE_MIN_VEL      = 3.5
+BOUNCE_UP_VEL_FLOOR = 11.0
+
+FREE_BOUNCE_SPEED_TH   = 12.0
+FREE_BOUNCE_DAMP       = 0.78
+FREE_BOUNCE_FRICTION   = 0.985
+FREE_BOUNCE_MIN_SPD    = 1.35
+
+GIANT_FREE_BOUNCE_DAMP     = 0.6
+GIANT_FREE_BOUNCE_FRICTION = 0.94
+GIANT_FREE_BOUNCE_MIN_SPD  = 1.6
+
+FOLLOW_JUMP_NEAR = 60
+FOLLOW_JUMP_HOLD = 0.6
+FOLLOW_FAST_DIST = 400
+FOLLOW_RUN_DIST  = 200
+
+TICK_MS  = 16
+TICK_SEC = TICK_MS / 1000.0
+
+
+class Body:
+    # 펫 하나의 시뮬레이션 상태. 창 좌표(x, y)와 창 크기(w, h)는 픽셀 정수
+    __slots__ = ("x", "y", "w", "h", "vx", "vy", "bounce_count",
+                 "manual_drop", "free_bounce", "dragging", "follow_mouse", "random_walk",
+                 "is_giant", "active_temp_action", "force_action_until", "action",
+                 "rw_vx", "clean_vx", "is_climbing", "climb_side",
+                 "climb_locked_from_drag", "climb_lock_expire")
+
+    def __init__(self, x: int = 0, y: int = 0, w: int = 64, h: int = 64):
+        self.x, self.y, self.w, self.h = x, y, w, h
+        self.vx, self.vy = 0.0, 0.0
+        self.bounce_count = 0
+        self.manual_drop = False
+        self.free_bounce = False
+        self.dragging = False
+        self.follow_mouse = False
+        self.random_walk = False
+        self.is_giant = False
+        self.active_temp_action = None
+        self.force_action_until = 0.0
+        self.action = None
+        self.rw_vx = None
+        self.clean_vx = 0
+        self.is_climbing = False
+        self.climb_side = None
+        self.climb_locked_from_drag = False
+        self.climb_lock_expire = 0.0
+
+
+class World:
+    # tick 하나 동안 펫이 보는 바깥 세계: 바닥/벽이 되는 데스크톱 영역, 시각, 커서.
+    # cursor_x 는 따라가기 모드에서만 부르므로 기록 세션의 커서 샘플 수가 늘지 않는다
+    __slots__ = ("left", "top", "width", "height", "now", "cursor_x", "rng")
+
+    def __init__(self, left, top, width, height, now, cursor_x, rng=random):
+        self.left, self.top, self.width, self.height = left, top, width, height
+        self.now = now
+        self.cursor_x = cursor_x
+        self.rng = rng
+
+    def floor_y(self, b: Body):
+        return self.top + self.height - b.h
+
+
+# step_* 는 Body 를 제자리에서 갱신하고, 액션을 바꿔야 하면 (action, force, suppress_bounce)
+# 를 돌려준다. 창 쪽은 이를 set_action 에 그대로 넘긴다
+def pin_climb_to_wall(b: Body, w: World):
+    if not b.is_climbing or not b.climb_locked_from_drag:
+        return
+    if b.climb_side == "left":
+        b.x = w.left
+    elif b.climb_side == "right":
+        b.x = w.left + w.width - b.w
+
+
+def _gravity_bounce(b: Body, bottom: int):
+    b.vy += GRAVITY
+    ny = b.y + int(b.vy)
+    landed = False
+    if ny >= bottom:
+        if abs(b.vy) > BOUNCE_MIN_VEL and b.bounce_count < BOUNCE_MAX:
+            b.vy = -abs(b.vy) * BOUNCE_K
+            if b.vy > -BOUNCE_UP_VEL_FLOOR:
+                b.vy = -BOUNCE_UP_VEL_FLOOR
+            b.bounce_count += 1
+            ny = bottom - 1
+        else:
+            ny = bottom
+            b.vy = 0.0
+            b.bounce_count = 0
+            landed = True
+    b.y = ny
+    return landed
+
+
+def _on_floor(b: Body, bottom: int):
+    b.y = bottom
+    b.vy = 0.0
+    b.manual_drop = False
+    b.bounce_count = 0
+
+
+def step_normal(b: Body, w: World):
+    now = w.now
+    if b.is_climbing and b.climb_locked_from_drag and not b.dragging:
+        if now < b.climb_lock_expire:
+            pin_climb_to_wall(b, w)
+            return None
+        b.climb_locked_from_drag = False
+        b.is_climbing = False
+        b.climb_side = None
+        b.manual_drop = True
+        b.free_bounce = False
+        b.vy = 0.0
+        b.bounce_count = 0
+
+    if b.free_bounce:
+        step_free_bounce(b, w)
+        return None
+
+    left_edge  = w.left
+    right_edge = w.left + w.width - b.w
+    bottom_win = w.floor_y(b)
+
+    if not b.dragging:
+        if b.manual_drop:
+            if _gravity_bounce(b, bottom_win):
+                b.manual_drop = False
+        elif b.y < bottom_win:
+            _gravity_bounce(b, bottom_win)
+        else:
+            b.vy = 0.0
+            b.y = bottom_win
+
+    if b.manual_drop or b.dragging:
+        return None
+
+    if b.follow_mouse and not b.active_temp_action:
+        mx = w.cursor_x()
+        cx = b.x + b.w // 2
+        dist = abs(mx - cx)
+        if dist <= FOLLOW_JUMP_NEAR:
+            if now >= b.force_action_until:
+                b.force_action_until = now + FOLLOW_JUMP_HOLD
+            b.y = bottom_win
+            if b.action != "jump":
+                return ("jump", True, False)
+            return None
+        dx = mx - cx
+        speed = 6 if dist > FOLLOW_FAST_DIST else 3
+        step = speed if dx > 0 else -speed
+        b.x = max(left_edge, min(right_edge, b.x + step))
+        _on_floor(b, bottom_win)
+        if dist > FOLLOW_RUN_DIST:
+            want = "run_right" if dx > 0 else "run_left"
+        else:
+            want = "walk_right" if dx > 0 else "walk_left"
+        if want != b.action:
+            return (want, False, False)
+        return None
+
+    if b.random_walk and not b.active_temp_action:
+        vx = b.rw_vx
+        if not vx:
+            vx = w.rng.choice([-2, -1, 1, 2])
+        nx = b.x + vx
+        if nx <= left_edge:
+            nx = left_edge
+            vx = abs(vx)
+        elif nx >= right_edge:
+            nx = right_edge
+            vx = -abs(vx)
+        b.rw_vx = vx
+        b.x = nx
+        _on_floor(b, bottom_win)
+        want = "walk_right" if vx > 0 else "walk_left"
+        if want != b.action:
+            return (want, False, False)
+        return None
+
+    if not b.active_temp_action and not b.follow_mouse and not b.random_walk:
+        if b.action != "idle":
+            return ("idle", False, False)
+    return None
+
+
+def step_free_bounce(b: Body, w: World):
+    nx = b.x + int(b.vx)
+    ny = b.y + int(b.vy)
+
+    if b.is_giant:
+        damp = GIANT_FREE_BOUNCE_DAMP
+        fric = GIANT_FREE_BOUNCE_FRICTION
+        min_spd = GIANT_FREE_BOUNCE_MIN_SPD
+    else:
+        damp = FREE_BOUNCE_DAMP
+        fric = FREE_BOUNCE_FRICTION
+        min_spd = FREE_BOUNCE_MIN_SPD
+
+    if nx <= w.left:
+        nx = w.left
+        b.vx = -b.vx * damp
+    elif nx + b.w >= w.left + w.width:
+        nx = w.left + w.width - b.w
+        b.vx = -b.vx * damp
+
+    if ny <= w.top:
+        ny = w.top
+        b.vy = -b.vy * damp
+    elif ny + b.h >= w.top + w.height:
+        ny = w.top + w.height - b.h
+        b.vy = -b.vy * damp
+
+    b.x, b.y = nx, ny
+    b.vx *= fric
+    b.vy *= fric
+    if math.hypot(b.vx, b.vy) < min_spd:
+        b.free_bounce = False
+        b.manual_drop = True
+        b.bounce_count = 0
+        b.vx = 0.0
+
+
+def step_cleaning(b: Body, w: World):
+    if b.action not in ("clean_left", "clean_right"):
+        return None
+    want = None
+    nx = b.x + b.clean_vx
+    if nx <= w.left:
+        nx = w.left
+        b.clean_vx = abs(b.clean_vx)
+        want = ("clean_right", True, True)
+    elif nx + b.w >= w.left + w.width:
+        nx = w.left + w.width - b.w
+        b.clean_vx = -abs(b.clean_vx)
+        want = ("clean_left", True, True)
+    b.x = nx
+    b.y = w.floor_y(b)
+    b.manual_drop = False
+    b.free_bounce = False
+    b.vy = 0.0
+    b.bounce_count = 0
+    return want
+
+
+# ===== 벤치마크 =====
+def _bench_world(now, rng, desk):
+    # 커서는 화면을 좌우로 천천히 왕복
+    left, top, width, height = desk
+    cursor = lambda: left + int((math.sin(now * 0.7) * 0.5 + 0.5) * width)
+    return World(left, top, width, height, now, cursor, rng)
+
+
+def bench(n_pets: int, seconds: float, seed: int = 0, desk=(0, 0, 1920, 1040)):
+    rng = random.Random(seed)
+    bodies = []
+    for i in range(n_pets):
+        b = Body(rng.randint(0, desk[2] - 120), rng.randint(0, desk[3] // 2), 120, 160)
+        kind = i % 4
+        if kind == 0:
+            b.random_walk = True
+        elif kind == 1:
+            b.follow_mouse = True
+        elif kind == 2:
+            b.free_bounce = True
+            b.vx, b.vy = rng.uniform(-30, 30), rng.uniform(-30, 30)
+        else:
+            b.manual_drop = True
+        bodies.append(b)
+
+    ticks = int(seconds / TICK_SEC)
+    changes = 0
+    t0 = time.perf_counter()
+    for k in range(ticks):
+        w = _bench_world(k * TICK_SEC, rng, desk)
+        for b in bodies:
+            want = step_normal(b, w)
+            if want is not None:
+                b.action = want[0]
+                changes += 1
+    wall = time.perf_counter() - t0
+    return ticks * n_pets, changes, wall
+
+
+def main_cli(argv=None):
+    ap = argparse.ArgumentParser(description="창 없이 펫 물리만 돌려 tick 처리량 측정")
+    ap.add_argument("--pets", type=int, default=100)
+    ap.add_argument("--seconds", type=float, default=60.0, help="시뮬레이션할 가상 시간(초)")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    steps, changes, wall = bench(args.pets, args.seconds, args.seed)
+    print(f"{steps} pet-ticks in {wall:.2f}s wall ({steps / max(wall, 1e-9):,.0f} ticks/s),"
+          f" {changes} action changes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
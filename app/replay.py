@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+# PET_RECORD 로 남긴 세션을 화면 없이 최대 속도로 다시 돌리는 재생 하네스
+#
+#   PET_RECORD=session.jsonl python app/main.py          # 기록
+#   python app/replay.py session.jsonl --json cost.json  # 재생 + tick 비용 비교용 출력
+#   PET_TRACE=trace.json python app/replay.py session.jsonl  # 재생한 구간의 Chrome trace
+#
+# 시계, 커서, 펫 타이머를 가상 구현으로 바꿔 끼우고, 가장 먼저 오는 타이머/입력부터
+# 순서대로 처리한다. 실제로 기다리는 시간이 없으므로 tick 비용만 측정된다.
+import argparse, json, os, random, sys, tempfile, time, weakref
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+# 재생 중 마지막 펫을 닫아도 사용자의 세션 스냅샷은 건드리지 않도록
+os.environ.setdefault("PET_SNAPSHOT", os.path.join(tempfile.gettempdir(), "pet-replay-session.json"))
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+import main
+
+
+class VirtualClock:
+    def __init__(self, t: float = 1000.0):
+        self.t = t
+
+
+class TimerScheduler:
+    def __init__(self, clock: VirtualClock):
+        self.clock = clock
+        self.timers = set()
+        self._seq = 0
+
+    def next_seq(self):
+        self._seq += 1
+        return self._seq
+
+    def next_due(self):
+        best = None
+        for t in self.timers:
+            if t._active and (best is None or (t._due, t._seq) < (best._due, best._seq)):
+                best = t
+        return best
+
+
+SCHED = None
+
+
+class VirtualTimer(QtCore.QObject):
+    # QTimer 와 같은 모양이지만 가상 시계 기준으로 TimerScheduler 가 직접 발화시킨다
+    timeout = QtCore.pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._interval = 0
+        self._single = False
+        self._active = False
+        self._due = 0.0
+        self._seq = 0
+        SCHED.timers.add(self)
+        # 람다가 self 를 잡으면 Qt 쪽이 지워진 뒤에도 래퍼가 살아남는다 — 약한 참조로만 찾는다
+        ref = weakref.ref(self)
+        self.destroyed.connect(lambda *_: SCHED.timers.discard(ref()))
+
+    def setInterval(self, ms):
+        self._interval = int(ms)
+
+    def interval(self):
+        return self._interval
+
+    def setSingleShot(self, single):
+        self._single = bool(single)
+
+    def isSingleShot(self):
+        return self._single
+
+    def isActive(self):
+        return self._active
+
+    def start(self, ms=None):
+        if ms is not None:
+            self._interval = int(ms)
+        self._active = True
+        self._due = SCHED.clock.t + max(self._interval, 1) / 1000.0
+        self._seq = SCHED.next_seq()
+
+    def stop(self):
+        self._active = False
+
+    def remainingTime(self):
+        if not self._active:
+            return -1
+        return max(0, int((self._due - SCHED.clock.t) * 1000))
+
+    def fire(self):
+        if self._single:
+            self._active = False
+        else:
+            self._due += max(self._interval, 1) / 1000.0
+            self._seq = SCHED.next_seq()
+        self.timeout.emit()
+
+
+class ReplaySession(main.Session):
+    Timer = VirtualTimer
+
+    def __init__(self, clock: VirtualClock, cursor_samples):
+        self.clock = clock
+        self.samples = cursor_samples   # [(t, x, y)] — t 는 가상 시계 기준
+        self._i = 0
+        self._pos = QtCore.QPoint(0, 0)
+
+    def now(self):
+        return self.clock.t
+
+    def cursor_pos(self):
+        while self._i < len(self.samples) and self.samples[self._i][0] <= self.clock.t:
+            _, x, y = self.samples[self._i]
+            self._pos = QtCore.QPoint(x, y)
+            self._i += 1
+        return QtCore.QPoint(self._pos)
+
+
+def load_session(path):
+    start, events, cursor = None, [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            e = json.loads(line)
+            if e["ev"] == "start":
+                start = e
+            elif e["ev"] == "cursor":
+                cursor.append(e)
+            else:
+                events.append(e)
+    if start is None:
+        raise ValueError(f"{path}: start 이벤트 없음")
+    return start, events, cursor
+
+
+_MOUSE_TYPES = {
+    "press":   QtCore.QEvent.MouseButtonPress,
+    "move":    QtCore.QEvent.MouseMove,
+    "release": QtCore.QEvent.MouseButtonRelease,
+    "double":  QtCore.QEvent.MouseButtonDblClick,
+}
+
+
+def inject(mgr, e):
+    pets = {p.pid: p for p in mgr.pets}
+    ev = e["ev"]
+    if ev == "quality":
+        mgr.quality.set_level(e["level"])
+        return
+    pet = pets.get(e.get("pet"))
+    if pet is None:
+        return
+    if ev == "mouse":
+        gpos = QtCore.QPointF(e["gx"], e["gy"])
+        lpos = gpos - QtCore.QPointF(pet.pos())
+        qev = QtGui.QMouseEvent(_MOUSE_TYPES[e["kind"]], lpos, gpos,
+                                QtCore.Qt.MouseButton(e["button"]),
+                                QtCore.Qt.MouseButtons(e["buttons"]),
+                                QtCore.Qt.NoModifier)
+        {"press": pet.mousePressEvent, "move": pet.mouseMoveEvent,
+         "release": pet.mouseReleaseEvent, "double": pet.mouseDoubleClickEvent}[e["kind"]](qev)
+    elif ev == "key":
+        pet.keyPressEvent(QtGui.QKeyEvent(QtCore.QEvent.KeyPress, e["key"], QtCore.Qt.NoModifier))
+    elif ev == "menu":
+        if e["key"] == "stats":
+            return      # 모달 창은 재생에서 건너뜀
+        pet._on_menu_action(e["key"])
+
+
+def replay(path, tail: float = 1.0, duration: float = None):
+    global SCHED
+    start, events, cursor = load_session(path)
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv[:1])
+    clock = VirtualClock()
+    SCHED = TimerScheduler(clock)
+    t0 = clock.t
+    main.session = ReplaySession(clock, [(t0 + c["t"], c["x"], c["y"]) for c in cursor])
+    random.seed(start["seed"])
+
+    screens = [[g.x(), g.y(), g.width(), g.height()]
+               for g in (scr.availableGeometry() for scr in app.screens())]
+    if screens != start.get("screens"):
+        print(f"경고: 화면 구성이 기록과 다름 {start.get('screens')} -> {screens}", file=sys.stderr)
+
+    if main.TRACE_PATH:
+        main.install_tracer(main.TRACE_PATH)
+    mgr = main.PetManager(app)
+    mgr.quality.timer.stop()        # 품질 단계는 기록된 quality 이벤트로만 바뀐다
+    mgr.snapshot_timer.stop()       # 재생이 사용자 세션 스냅샷을 덮어쓰지 않도록
+    mgr.spawn()
+
+    end = t0 + (duration if duration is not None else (events[-1]["t"] if events else 0.0) + tail)
+    costs = {"update_loop": main.FrameHistogram(main.FRAME_COST_BIN_MS),
+             "game_tick": main.FrameHistogram(main.FRAME_COST_BIN_MS),
+             "other": main.FrameHistogram(main.FRAME_COST_BIN_MS)}
+    i = 0
+    steps = 0
+    wall0 = time.perf_counter()
+    while mgr.pets:
+        timer = SCHED.next_due()
+        ev_t = t0 + events[i]["t"] if i < len(events) else float("inf")
+        t_timer = timer._due if timer is not None else float("inf")
+        t = min(ev_t, t_timer)
+        if t > end:
+            break
+        clock.t = t
+        if ev_t <= t_timer:
+            inject(mgr, events[i])
+            i += 1
+        else:
+            owner = timer.parent()
+            kind = "other"
+            if owner is not None and timer is getattr(owner, "tick", None):
+                kind = "update_loop"
+            elif owner is not None and timer is getattr(owner, "game_timer", None):
+                kind = "game_tick"
+            c0 = time.perf_counter()
+            timer.fire()
+            costs[kind].add((time.perf_counter() - c0) * 1000.0)
+        steps += 1
+        if steps % 256 == 0:
+            QtCore.QCoreApplication.sendPostedEvents(None, QtCore.QEvent.DeferredDelete)
+    wall = time.perf_counter() - wall0
+    return mgr, costs, clock.t - t0, wall
+
+
+def main_cli(argv=None):
+    ap = argparse.ArgumentParser(description="기록된 펫 세션을 헤드리스로 재생")
+    ap.add_argument("session")
+    ap.add_argument("--tail", type=float, default=1.0, help="마지막 입력 뒤로 더 돌릴 시간(초)")
+    ap.add_argument("--duration", type=float, default=None, help="재생할 가상 시간(초)")
+    ap.add_argument("--json", default=None, help="tick 비용 요약을 JSON 으로 저장")
+    args = ap.parse_args(argv)
+
+    mgr, costs, sim_sec, wall = replay(args.session, args.tail, args.duration)
+    print(f"simulated {sim_sec:.1f}s in {wall:.2f}s wall ({sim_sec / max(wall, 1e-9):.1f}x)")
+    report = {"simulated_sec": sim_sec, "wall_sec": wall}
+    for kind, h in costs.items():
+        if not h.count:
+            continue
+        row = {"n": h.count, "mean_ms": h.total_ms / h.count, "p50_ms": h.percentile(0.5),
+               "p95_ms": h.percentile(0.95), "p99_ms": h.percentile(0.99), "max_ms": h.max_ms}
+        report[kind] = row
+        print(f"{kind:<12} n={row['n']:<8} mean={row['mean_ms']:.3f} p50={row['p50_ms']:.2f}"
+              f" p95={row['p95_ms']:.2f} p99={row['p99_ms']:.2f} max={row['max_ms']:.2f} ms")
+    print(mgr.frame_stats.summary())
+    trace = mgr.dump_trace()
+    if trace is not None:
+        print(f"trace: {trace[0]} ({trace[1]} spans)")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
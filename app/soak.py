@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+# 가상 시계로 몇 시간 분량을 돌리며 메모리/QObject 누수를 잡는 소크 하네스
+#
+#   python app/soak.py --hours 4               # 4시간 분량, 누수 기준 넘으면 종료 코드 1
+#   python app/soak.py --hours 1 --json soak.json
+#
+# replay.py 의 가상 타이머/세션을 그대로 쓰고, 입력은 기록 대신 시나리오가 만든다.
+# 펫 추가/삭제, 모든 모드와 미니게임, 클릭/드래그/던지기를 섞어서 반복한다.
+# 워밍업 뒤와 끝에서 같은 상태(펫 1마리, normal)로 맞춘 다음 측정해서 증가량을 비교한다.
+import argparse, gc, heapq, json, math, os, random, sys, time, tracemalloc
+
+import replay                   # QT_QPA_PLATFORM / PET_SNAPSHOT 기본값도 여기서 잡힌다
+from PyQt5 import sip
+from replay import QtCore, QtWidgets, main
+
+MENU_KEYS = ["follow", "random", "dance", "eat", "pet", "exercise", "sleep", "clean",
+             "giant", "multi"] + [f"size:{i}" for i in range(len(main.SCALE_PRESETS))]
+GAME_KEYS = ["game_snack", "game_obstacle", "game_heading"]
+if main.np is not None:
+    GAME_KEYS.append("game_multiball")
+GAME_SEC  = 20.0
+
+
+def rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    import resource     # 최대치밖에 없지만 증가 여부는 본다
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def live_qobjects():
+    # C++ 객체가 이미 지워진 래퍼는 gc 가 아직 안 거둔 것일 뿐이라 세지 않는다
+    return sum(1 for o in gc.get_objects() if isinstance(o, QtCore.QObject) and not sip.isdeleted(o))
+
+
+class SoakSession(replay.ReplaySession):
+    # 커서는 화면 위를 천천히 8자로 움직인다 (따라가기/헤딩 게임용)
+    def __init__(self, clock, rect: QtCore.QRect):
+        super().__init__(clock, [])
+        self.rect = rect
+
+    def cursor_pos(self):
+        t = self.clock.t
+        r = self.rect
+        x = r.x() + r.width() * (0.5 + 0.45 * math.sin(t * 0.31))
+        y = r.y() + r.height() * (0.5 + 0.4 * math.sin(t * 0.62))
+        return QtCore.QPoint(int(x), int(y))
+
+
+class Scenario:
+    def __init__(self, mgr, clock, rng: random.Random, max_pets: int):
+        self.mgr = mgr
+        self.clock = clock
+        self.rng = rng
+        self.max_pets = max_pets
+        self.queue = []         # (t, seq, 이벤트) — replay.inject 형식
+        self._seq = 0
+        self.next_op = clock.t + 1.0
+        self.game_pet = None
+        self.game_until = 0.0
+        self.ops = 0
+
+    def push(self, dt, e):
+        self._seq += 1
+        heapq.heappush(self.queue, (self.clock.t + dt, self._seq, e))
+
+    def next_due(self):
+        t = self.next_op
+        if self.queue:
+            t = min(t, self.queue[0][0])
+        return t
+
+    def step(self):
+        if self.queue and self.queue[0][0] <= self.clock.t:
+            _, _, e = heapq.heappop(self.queue)
+            if e["ev"] == "spawn":
+                self.mgr.spawn()
+            elif e["ev"] == "remove":
+                pet = next((p for p in self.mgr.pets if p.pid == e["pet"]), None)
+                if pet is not None and len(self.mgr.pets) > 1:
+                    self.mgr.remove(pet)
+            else:
+                replay.inject(self.mgr, e)
+            return
+        self.next_op = self.clock.t + self.rng.uniform(0.5, 4.0)
+        self.ops += 1
+        self._pick()
+
+    def _pick(self):
+        mgr, rng = self.mgr, self.rng
+        if self.game_pet is not None:
+            if self.clock.t >= self.game_until:
+                self.push(0.0, {"ev": "key", "pet": self.game_pet, "key": int(QtCore.Qt.Key_Escape)})
+                self.game_pet = None
+            elif rng.random() < 0.5:
+                self._click(self.game_pet)      # 장애물 게임 점프
+            return
+        if not mgr.pets:
+            self.push(0.0, {"ev": "spawn"})
+            return
+        pet = rng.choice(mgr.pets)
+        r = rng.random()
+        if r < 0.10 and len(mgr.pets) < self.max_pets:
+            self.push(0.0, {"ev": "spawn"})
+        elif r < 0.18 and len(mgr.pets) > 1:
+            self.push(0.0, {"ev": "remove", "pet": pet.pid})
+        elif r < 0.25:
+            self.game_pet = pet.pid
+            self.game_until = self.clock.t + GAME_SEC
+            self.push(0.0, {"ev": "menu", "pet": pet.pid, "key": rng.choice(GAME_KEYS)})
+        elif r < 0.60:
+            self.push(0.0, {"ev": "menu", "pet": pet.pid, "key": rng.choice(MENU_KEYS)})
+        elif r < 0.80:
+            self._click(pet.pid, double=rng.random() < 0.3)
+        else:
+            self._drag(pet, throw=rng.random() < 0.5)
+
+    def _mouse(self, dt, pid, kind, gx, gy, buttons):
+        button = 1 if kind != "move" else 0
+        self.push(dt, {"ev": "mouse", "pet": pid, "kind": kind, "gx": gx, "gy": gy,
+                       "button": button, "buttons": buttons})
+
+    def _click(self, pid, double=False):
+        pet = next((p for p in self.mgr.pets if p.pid == pid), None)
+        if pet is None:
+            return
+        c = pet.geometry().center()
+        self._mouse(0.00, pid, "press", c.x(), c.y(), 1)
+        self._mouse(0.05, pid, "release", c.x(), c.y(), 0)
+        if double:
+            self._mouse(0.15, pid, "double", c.x(), c.y(), 1)
+            self._mouse(0.20, pid, "release", c.x(), c.y(), 0)
+
+    def _drag(self, pet, throw):
+        c = pet.geometry().center()
+        dx = self.rng.choice([-1, 1]) * (60 if throw else 8)
+        dy = -40 if throw else 4
+        self._mouse(0.0, pet.pid, "press", c.x(), c.y(), 1)
+        for i in range(1, 9):
+            self._mouse(0.016 * i, pet.pid, "move", c.x() + dx * i, c.y() + dy * i, 1)
+        end = c + QtCore.QPoint(dx * 8, dy * 8)
+        self._mouse(0.016 * 9, pet.pid, "release", end.x(), end.y(), 0)
+
+    def settle(self):
+        # 측정 전에 같은 상태로: 게임 종료, 펫 1마리, 모드/이동 끔
+        self.queue = []
+        self.game_pet = None
+        for pet in list(self.mgr.pets):
+            if pet.state in main.GAME_STATES:
+                pet._exit_game_mode()
+        while len(self.mgr.pets) > 1:
+            self.mgr.remove(self.mgr.pets[-1])
+        if not self.mgr.pets:
+            self.mgr.spawn()
+        pet = self.mgr.pets[0]
+        pet._exit_modes()
+        pet.follow_mouse = pet.random_walk = False
+        if pet.is_giant:
+            pet._on_menu_action("giant")
+
+
+def run(hours, seed, max_pets, sample_min, warmup_min, log=print):
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv[:1])
+    clock = replay.VirtualClock()
+    replay.SCHED = replay.TimerScheduler(clock)
+    main.session = SoakSession(clock, main.desktop_virtual_rect())
+    random.seed(seed)
+
+    mgr = main.PetManager(app)
+    mgr.quality.timer.stop()
+    mgr.snapshot_timer.stop()
+    mgr.MAX_PETS = max(mgr.MAX_PETS, max_pets)
+    mgr.spawn()
+    scen = Scenario(mgr, clock, random.Random(seed), max_pets)
+
+    t0 = clock.t
+    end = t0 + hours * 3600.0
+    warm_t = t0 + warmup_min * 60.0
+    next_sample = t0 + sample_min * 60.0
+    samples, baseline = [], None
+    steps = 0
+    wall0 = time.perf_counter()
+    tracemalloc.start(10)
+
+    def measure(tag):
+        QtCore.QCoreApplication.sendPostedEvents(None, QtCore.QEvent.DeferredDelete)
+        gc.collect()
+        row = {"tag": tag, "sim_min": (clock.t - t0) / 60.0, "pets": len(mgr.pets),
+               "rss_mb": rss_bytes() / 1e6, "qobjects": live_qobjects(),
+               "widgets": len(QtWidgets.QApplication.allWidgets()),
+               "timers": len(replay.SCHED.timers),
+               "py_mb": tracemalloc.get_traced_memory()[0] / 1e6, "ops": scen.ops}
+        samples.append(row)
+        log(f"{row['tag']:<8} {row['sim_min']:>7.1f}min pets={row['pets']:<3} rss={row['rss_mb']:7.1f}MB"
+            f" qobj={row['qobjects']:<6} widgets={row['widgets']:<5} timers={row['timers']:<5}"
+            f" py={row['py_mb']:6.1f}MB")
+        return row
+
+    def settle_and_measure(tag):
+        scen.settle()
+        # 남은 임시 모션/애니메이션 타이머가 끝나도록 조금 더 돌린다
+        advance(clock.t + 10.0, inputs=False)
+        return measure(tag), tracemalloc.take_snapshot()
+
+    def advance(until, inputs=True):
+        nonlocal steps
+        while clock.t < until:
+            timer = replay.SCHED.next_due()
+            t_timer = timer._due if timer is not None else float("inf")
+            t_input = scen.next_due() if inputs else float("inf")
+            t = min(t_timer, t_input, until)
+            clock.t = t
+            if t >= until:
+                break
+            if t_input <= t_timer:
+                scen.step()
+            else:
+                timer.fire()
+            steps += 1
+            if steps % 256 == 0:
+                QtCore.QCoreApplication.sendPostedEvents(None, QtCore.QEvent.DeferredDelete)
+
+    advance(warm_t)
+    baseline, base_snap = settle_and_measure("base")
+    while clock.t < end:
+        advance(min(next_sample, end))
+        if clock.t >= next_sample:
+            measure("sample")
+            next_sample += sample_min * 60.0
+    final, final_snap = settle_and_measure("final")
+    wall = time.perf_counter() - wall0
+    top = final_snap.compare_to(base_snap, "lineno")[:10]
+    tracemalloc.stop()
+    return mgr, baseline, final, samples, top, wall, clock.t - t0
+
+
+def main_cli(argv=None):
+    ap = argparse.ArgumentParser(description="헤드리스 장시간 소크 테스트 (누수 검출)")
+    ap.add_argument("--hours", type=float, default=2.0, help="돌릴 가상 시간(시간)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--max-pets", type=int, default=8)
+    ap.add_argument("--sample-min", type=float, default=15.0, help="중간 측정 간격(가상 분)")
+    ap.add_argument("--warmup-min", type=float, default=10.0, help="기준 측정 전 워밍업(가상 분)")
+    ap.add_argument("--max-rss-mb", type=float, default=64.0, help="허용 RSS 증가량")
+    ap.add_argument("--max-qobjects", type=int, default=100, help="허용 QObject 증가 수")
+    ap.add_argument("--max-py-mb", type=float, default=16.0, help="허용 파이썬 힙 증가량 (tracemalloc)")
+    ap.add_argument("--json", default=None, help="측정값을 JSON 으로 저장")
+    args = ap.parse_args(argv)
+
+    mgr, base, final, samples, top, wall, sim_sec = run(
+        args.hours, args.seed, args.max_pets, args.sample_min, args.warmup_min)
+    print(f"simulated {sim_sec / 3600:.2f}h in {wall:.1f}s wall")
+
+    growth = {"rss_mb": final["rss_mb"] - base["rss_mb"],
+              "qobjects": final["qobjects"] - base["qobjects"],
+              "py_mb": final["py_mb"] - base["py_mb"]}
+    limits = {"rss_mb": args.max_rss_mb, "qobjects": args.max_qobjects, "py_mb": args.max_py_mb}
+    failed = [k for k in growth if growth[k] > limits[k]]
+    for k in growth:
+        mark = "FAIL" if k in failed else "ok"
+        print(f"  {k:<9} +{growth[k]:.1f} (limit {limits[k]})  {mark}")
+    if failed:
+        print("tracemalloc 증가 상위:")
+        for stat in top:
+            print(f"  {stat}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"samples": samples, "growth": growth, "limits": limits,
+                       "failed": failed}, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())